@@ -1,7 +1,7 @@
 import logging
 from numpy import linalg as LA
 from Panda3dPhysics import Panda3dPhysics
-from Panda3dDisplay import Panda3dDisplay
+from profiling import PhaseTimer
 
 import numpy as np
 
@@ -16,6 +16,8 @@ class Environment:
     GRAVITY_ACCELERATION = 9.81
     ANGLE_SCALE = 90
     PHYSICAL_STEPS_PER_ACTION = 10
+    # per step bullet statistics, see Panda3dPhysics.get_step_statistics. off by default, they cost every step
+    PHYSICS_STATISTICS = False
     MAX_STEPS_PER_EPISODE = 500
     # stability on initialization
     MAX_STABILITY_STEPS = 500
@@ -41,12 +43,23 @@ class Environment:
     # larger value causes less unneeded movements
     OVER_PRESS_JOINT_PENALTY = 0.5
 
-    def __init__(self, walker, render=False):
-        self.physics = Panda3dPhysics(joint_power=3, joint_speed=2, plane_friction=0.75, gravity_acceleration=9.81)
+    def __init__(self, walker, render=False, dtype='float64', timer=None):
+        self.dtype = np.dtype(dtype)
+        self.timer = PhaseTimer(enabled=False) if timer is None else timer
+        self.physics = Panda3dPhysics(joint_power=self.JOINT_POWER, joint_speed=self.JOINT_SPEED,
+                                      plane_friction=self.PLANE_FRICTION,
+                                      gravity_acceleration=self.GRAVITY_ACCELERATION,
+                                      collect_statistics=self.PHYSICS_STATISTICS)
         self.physics.add_walker(walker)
-        self.display = Panda3dDisplay(self.physics)
-        self.close_window()
+        # the display is created only when needed, so headless environments (e.g. evaluation workers) never
+        # construct a ShowBase
+        self.display = None
+        if render:
+            self.open_window()
         self._wait_for_stability(render)
+        self.close_window()
+        # the statistics are reported per episode, the initialization is not part of any
+        self.physics.pop_statistics()
         self.init_state = self.get_current_state()
         self.state_size = len(self.init_state)
         self.action_size = len(self.physics.constraints)
@@ -56,11 +69,18 @@ class Environment:
 
     def open_window(self):
         logging.debug('Opening window')
-        self.display = Panda3dDisplay(self.physics)
+        # the display is built once and then only shown and hidden, keeping its loaded scene
+        if self.display is None:
+            # imported here so headless environments never load ShowBase
+            from Panda3dDisplay import Panda3dDisplay
+            self.display = Panda3dDisplay(self.physics)
+        else:
+            self.display.show_window()
 
     def close_window(self):
         logging.debug('Closing window')
-        self.display.close_window()
+        if self.display is not None:
+            self.display.hide_window()
 
     def reset(self):
         logging.debug('Resetting environment')
@@ -73,8 +93,8 @@ class Environment:
         self.last_velocity = [self.LAST_VELOCITY_AVERAGE_INIT] * self.LAST_VELOCITY_HISTORY_SIZE
         return self.get_current_state()
 
-    def render(self):
-        self.display.render_scene()
+    def render(self, text=None):
+        self.display.render_scene(text)
 
     def _wait_for_stability(self, render):
         logging.debug('Waiting for walker to be stale')
@@ -108,7 +128,7 @@ class Environment:
                           self.physics.get_joint_angles_diff() / self.ANGLE_SCALE,
                           self.physics.get_bones_ground_contacts(),
                           self.physics.prev_action
-                          ))
+                          )).astype(self.dtype)
 
     def get_score(self):
         return self.physics.get_walker_position()[0]
@@ -125,9 +145,11 @@ class Environment:
         self.step_index += 1
         previous_velocity = self.get_walker_x_velocity()
         self.physics.apply_action(action)
-        for i in range(self.PHYSICAL_STEPS_PER_ACTION):
-            self.physics.step()
-        state = self.get_current_state()
+        with self.timer.phase('physics'):
+            for i in range(self.PHYSICAL_STEPS_PER_ACTION):
+                self.physics.step()
+        with self.timer.phase('state'):
+            state = self.get_current_state()
         reward = self.VELOCITY_REWARD * self.get_walker_x_velocity()
         reward += self.TIME_STEP_REWARD * self.step_index / self.MAX_STEPS_PER_EPISODE
         reward -= self.VELOCITY_DECREASE_PENALTY * max(0, previous_velocity - self.get_walker_x_velocity()) ** 2
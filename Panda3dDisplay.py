@@ -4,51 +4,69 @@ import math
 import numpy as np
 
 from direct.gui.OnscreenText import OnscreenText
-from direct.task import Task
 from direct.showbase.ShowBase import ShowBase
 
 import panda3d.core
 import panda3d.bullet
 
+from render_scheduler import RenderScheduler
+
 
 class Panda3dDisplay(ShowBase):
     """
     responsible for the visual side of the scene:
     ground, bones boxes, light and camera
     """
+    # frames per second drawn, independent of the simulation rate
+    DISPLAY_FPS = 30
 
     def __init__(self, physics):
         ShowBase.__init__(self)
         self.physics = physics
+        self.scheduler = RenderScheduler(self.DISPLAY_FPS)
         self.font = loader.loadFont('courier_new_bold.ttf')
+        self.textObject = None
         self.create_light()
         self.show_debug_frames()
         self.visualize_ground()
-        for bone in self.physics.bones_to_nodes:
-            self.visualize_bone(bone, self.physics.bones_to_nodes[bone])
+        # ordered like the physics bone nodes, the transforms are set by draw from the physics state
+        self.bone_nps = [self.visualize_bone(bone)
+                         for bone in sorted(self.physics.bones_to_nodes, key=lambda x: x.index)]
         render.setAntialias(panda3d.core.AntialiasAttrib.MAuto)
         render.setShaderAuto()
-        taskMgr.add(self.reposition_camera, "reposition_camera")
-        taskMgr.add(self.reposition_light, "_reposition_light")
         logging.debug('Visualization setup done')
 
-    def close_window(self):
-        base.destroy()
+    def hide_window(self):
+        # the window and its graphics context are kept, so the uploaded textures, meshes and shadow buffers are
+        # still there on show_window. an inactive window is not rendered
+        self.set_window_minimized(True)
+        self.win.setActive(False)
+        # the bullet debug geometry is updated on every physics step, don't pay for it while hidden
+        self.physics.world.clearDebugNode()
+
+    def show_window(self):
+        self.win.setActive(True)
+        self.set_window_minimized(False)
+        self.physics.world.setDebugNode(self.debug_np.node())
+        self.scheduler = RenderScheduler(self.DISPLAY_FPS)
+
+    def set_window_minimized(self, minimized):
+        properties = panda3d.core.WindowProperties()
+        properties.setMinimized(minimized)
+        self.win.requestProperties(properties)
 
     def finalizeExit(self):
         pass
 
-    def reposition_camera(self, task):
+    def reposition_camera(self, walker_position):
         camera_offset = panda3d.core.Vec3(30, 30, 30)
-        self.camera.setPos(self.physics.get_walker_position() + camera_offset)
-        self.camera.lookAt(self.physics.get_walker_position())
-        return Task.cont
+        self.camera.setPos(walker_position + camera_offset)
+        self.camera.lookAt(walker_position)
 
-    def reposition_light(self, task):
+    def reposition_light(self, walker_position):
         light_offset = panda3d.core.Vec3(0, 0, 100)
-        self.tracker_light_np.setPos(self.physics.get_walker_position() + light_offset)
-        self.tracker_light_np.lookAt(self.physics.get_walker_position())
-        return Task.cont
+        self.tracker_light_np.setPos(walker_position + light_offset)
+        self.tracker_light_np.lookAt(walker_position)
 
     def show_debug_frames(self):
         debug_node = panda3d.bullet.BulletDebugNode('Debug')
@@ -57,9 +75,9 @@ class Panda3dDisplay(ShowBase):
         debug_node.showConstraints(True)
         debug_node.showBoundingBoxes(False)
         debug_node.showNormals(True)
-        debug_np = render.attachNewNode(debug_node)
-        debug_np.show()
-        self.physics.world.setDebugNode(debug_np.node())
+        self.debug_np = render.attachNewNode(debug_node)
+        self.debug_np.show()
+        self.physics.world.setDebugNode(self.debug_np.node())
 
     def create_light(self):
         def create_ambient_light():
@@ -90,15 +108,15 @@ class Panda3dDisplay(ShowBase):
         # create_fixed_spotlight()
 
     def debug_screen_print(self, text):
-        try:
-            self.textObject.destroy()
-        except Exception:
-            pass
-
-        self.textObject = OnscreenText(text=text, pos=(0.1, 0.1 * text.count('\n')), scale=0.07,
-                                       align=panda3d.core.TextNode.ALeft, fg=(1.0, 1.0, 1.0, 1.0),
-                                       bg=(0.0, 0.0, 0.0, 0.5), font=self.font)
-        self.textObject.reparentTo(base.a2dBottomLeft)
+        # the text node is created once and updated in place
+        if self.textObject is None:
+            self.textObject = OnscreenText(text=text, pos=(0.1, 0.1 * text.count('\n')), scale=0.07,
+                                           align=panda3d.core.TextNode.ALeft, fg=(1.0, 1.0, 1.0, 1.0),
+                                           bg=(0.0, 0.0, 0.0, 0.5), font=self.font, mayChange=True)
+            self.textObject.reparentTo(base.a2dBottomLeft)
+        else:
+            self.textObject.setText(text)
+            self.textObject.setPos(0.1, 0.1 * text.count('\n'))
 
     def visualize_ground(self):
         card_maker = panda3d.core.CardMaker('')
@@ -113,14 +131,33 @@ class Panda3dDisplay(ShowBase):
         ground_np.setPos(panda3d.core.Vec3(0, 0, 0))
         ground_np.setTexture(loader.loadTexture('maps/grid.rgb'))
 
-    def visualize_bone(self, bone, bone_node):
-        bone_display_node = render.attachNewNode(bone_node)
+    def visualize_bone(self, bone):
+        bone_display_node = render.attachNewNode(bone.name)
         bone_display_node.setShaderAuto()
-        bone.model = loader.loadModel('models/box.egg')
-        bone.model.setScale(panda3d.core.Vec3(bone.length, bone.height, bone.width) * 2)
-        bone.model.setPos(panda3d.core.Vec3(-bone.length, -bone.height, -bone.width))
-        bone.model.reparentTo(bone_display_node)
+        model = loader.loadModel('models/box.egg')
+        model.setScale(panda3d.core.Vec3(bone.length, bone.height, bone.width) * 2)
+        model.setPos(panda3d.core.Vec3(-bone.length, -bone.height, -bone.width))
+        model.reparentTo(bone_display_node)
         bone_display_node.setColor(0.6, 0.6, 1.0, 1.0)
-
-    def render_scene(self):
+        return bone_display_node
+
+    def draw(self, positions, quaternions):
+        for bone_np, position, quaternion in zip(self.bone_nps, positions, quaternions):
+            bone_np.setPosQuat(panda3d.core.Vec3(*position), panda3d.core.Quat(*quaternion))
+        walker_position = panda3d.core.Vec3(*np.mean(positions, axis=0))
+        self.reposition_camera(walker_position)
+        self.reposition_light(walker_position)
+
+    def render_scene(self, text=None):
+        """
+        called on every physics state, draws a frame only when one is due by the display FPS.
+        the rendering runs within the simulation loop, so the frame shows the current state, the same one as the
+        bullet debug wireframe
+        """
+        if not self.scheduler.is_due():
+            return
+        self.draw(self.physics.get_bones_positions(), self.physics.get_bones_quaternions())
+        if text is not None:
+            self.debug_screen_print(text)
         taskMgr.step()
+        self.scheduler.frame_rendered()
@@ -1,4 +1,6 @@
+import collections
 import logging
+import time
 
 import numpy as np
 
@@ -7,13 +9,19 @@ from panda3d.core import Vec3
 from panda3d.core import Point3
 from panda3d.core import TransformState
 
+from trajectory import TrajectoryRecorder
+
 
 class Panda3dPhysics:
-    def __init__(self, joint_power=3, joint_speed=2, plane_friction=0.75, gravity_acceleration=9.81):
+    def __init__(self, joint_power=3, joint_speed=2, plane_friction=0.75, gravity_acceleration=9.81,
+                 collect_statistics=False):
         self.joint_power = joint_power
+        self.collect_statistics = collect_statistics
+        self.statistics = collections.defaultdict(list)
         self.joint_speed = joint_speed
         self.world = panda3d.bullet.BulletWorld()
         self.world.setGravity(Vec3(0, 0, -gravity_acceleration))
+        self.recorder = None
         self._create_ground(plane_friction)
 
     def _create_ground(self, plane_friction):
@@ -52,7 +60,7 @@ class Panda3dPhysics:
     def _create_joint_constraint(self, joint):
         parent_bone = joint.parent_bone
         child_bone = joint.child_bone
-        parent_frame_pos = Vec3(parent_bone.length + joint.gap_radius, 0, 0)
+        parent_frame_pos = Vec3(parent_bone.length + joint.gap_radius, 0, 0) + Vec3(*joint.parent_offset)
         child_frame_pos = Vec3(-child_bone.length - joint.gap_radius, 0, 0)
         parent_frame = TransformState.makePosHpr(parent_frame_pos, Vec3(*joint.parent_start_hpr))
         child_frame = TransformState.makePosHpr(child_frame_pos, Vec3(*joint.child_start_hpr))
@@ -75,6 +83,9 @@ class Panda3dPhysics:
     def get_bones_orientations(self):
         return np.array([node.getTransform().getHpr() for node in self._get_ordered_bone_nodes()])
 
+    def get_bones_quaternions(self):
+        return np.array([node.getTransform().getQuat() for node in self._get_ordered_bone_nodes()])
+
     def get_bones_linear_velocity(self):
         return np.array([node.getLinearVelocity() for node in self._get_ordered_bone_nodes()])
 
@@ -94,8 +105,20 @@ class Panda3dPhysics:
                     for node in self._get_ordered_bone_nodes()]
         return np.array([len(contact) for contact in contacts])
 
+    def start_recording(self, path):
+        bones = sorted(self.bones_to_nodes, key=lambda x: x.index)
+        self.recorder = TrajectoryRecorder(path, [(bone.length, bone.height, bone.width) for bone in bones],
+                                           len(self.constraints))
+
+    def stop_recording(self):
+        if self.recorder is not None:
+            self.recorder.close()
+            self.recorder = None
+
     def set_bones_pos_hpr(self, positions, orientations):
         # position - n x 3 array
+        if self.recorder is not None:
+            self.recorder.new_episode()
         for index, node in enumerate(self._get_ordered_bone_nodes()):
             transform = TransformState.makePosHpr(Vec3(*positions[index]), Vec3(*orientations[index]))
             node.setTransform(transform)
@@ -134,6 +157,8 @@ class Panda3dPhysics:
                 True, action[index] * self.joint_speed, self.joint_power)
         self.prev_action = action
         self.prev_angles = self.get_joint_angles()
+        if self.recorder is not None:
+            self.recorder.record(self.get_bones_positions(), self.get_bones_orientations(), action)
 
     def get_joint_angles_diff(self):
         return self.get_joint_angles() - self.prev_angles
@@ -145,4 +170,39 @@ class Panda3dPhysics:
         # return bone_node.getTransform().getPos()
 
     def step(self):
+        if not self.collect_statistics:
+            self.world.doPhysics(1)
+            return
+        start_time = time.perf_counter()
         self.world.doPhysics(1)
+        self.statistics['do_physics_sec'].append(time.perf_counter() - start_time)
+        for name, value in self.get_step_statistics().items():
+            self.statistics[name].append(value)
+
+    def get_step_statistics(self):
+        manifolds = [self.world.getManifold(i) for i in range(self.world.getNumManifolds())]
+        # counted over the bones only, the static ground is never active
+        active_bones = sum(node.isActive() for node in self.bones_to_nodes.values())
+        return {
+            'rigid_bodies': len(self.bones_to_nodes),
+            'active_rigid_bodies': active_bones,
+            'sleeping_rigid_bodies': len(self.bones_to_nodes) - active_bones,
+            'constraints': self.world.getNumConstraints(),
+            'contact_manifolds': len(manifolds),
+            'contact_points': sum(manifold.getNumManifoldPoints() for manifold in manifolds),
+        }
+
+    def pop_statistics(self):
+        """
+        aggregates the statistics of the steps since the last call, e.g. of an episode
+        """
+        aggregated = {}
+        for name, values in self.statistics.items():
+            if values:
+                aggregated['physics_{}_mean'.format(name)] = float(np.mean(values))
+                aggregated['physics_{}_max'.format(name)] = float(np.max(values))
+        if self.statistics['do_physics_sec']:
+            aggregated['physics_do_physics_sec_total'] = float(np.sum(self.statistics['do_physics_sec']))
+            aggregated['physics_steps'] = len(self.statistics['do_physics_sec'])
+        self.statistics.clear()
+        return aggregated
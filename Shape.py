@@ -6,7 +6,9 @@ BONES_COUNT = 4
 
 class Joint(object):
     def __init__(self, parent_bone, child_bone, min_range=-90, max_range=90,
-                 gap=None, child_start_hpr=(0, 0, 0), parent_start_hpr=(0, 0, 0)):
+                 gap=None, child_start_hpr=(0, 0, 0), parent_start_hpr=(0, 0, 0), parent_offset=(0, 0, 0)):
+        # moves the joint frame on the parent, in the parent's coordinates
+        self.parent_offset = parent_offset
         self.child_start_hpr = child_start_hpr
         self.parent_start_hpr = parent_start_hpr
         self.angle_range = (min_range, max_range)
@@ -37,6 +39,47 @@ class Shape(object):
         return [Joint(self.bones[random.choice(range(i))], self.bones[i]) for i in range(1, len(self.bones))]
 
 
+class Tree(Shape):
+    """
+    random tree of bones, each bone is jointed to a random earlier bone and starts at its joint frame.
+    bones that would start at the same place are moved along the hinge axis
+    """
+
+    def __init__(self, bones_count=BONES_COUNT):
+        self.bones_count = bones_count
+        super(Tree, self).__init__()
+
+    def _gen_joints(self):
+        return [Joint(self.bones[parent], self.bones[i], parent_offset=(0, 0, self.offsets[i]))
+                for i, parent in enumerate(self.parents) if i > 0]
+
+    def _gen_bones(self):
+        # the parents and offsets are chosen before the bones are placed, _gen_joints joins the same pairs
+        self.parents = [None] + [random.choice(range(i)) for i in range(1, self.bones_count)]
+        self.offsets = [0] * self.bones_count
+        bones = []
+        for i, parent in enumerate(self.parents):
+            bone = Bone(index=i, start_pos=(0, 0, INIT_Z), start_hpr=(0, 90, 0))
+            if parent is not None:
+                parent_bone = bones[parent]
+                # the joint frames lie on the bones x axes, which the (0, 90, 0) orientation keeps along the world x,
+                # and the hinge axis is the bones z axis, which it turns to the world -y
+                gap = parent_bone.height * 2
+                x, y, z = parent_bone.start_pos
+                x += parent_bone.length + gap + bone.length + gap
+                # the first free place along the hinge axis: 0, +1, -1, +2, ... bone widths apart
+                spacing = bone.width * 2 + gap
+                # rounded, the positions add up the lengths along different paths
+                occupied = {tuple(round(value, 6) for value in other.start_pos) for other in bones}
+                steps = 0
+                while tuple(round(value, 6) for value in (x, y - self.offsets[i], z)) in occupied:
+                    steps += 1
+                    self.offsets[i] = spacing * ((steps + 1) // 2) * (1 if steps % 2 else -1)
+                bone.start_pos = (x, y - self.offsets[i], z)
+            bones.append(bone)
+        return bones
+
+
 class Worm(Shape):
     def _gen_joints(self):
         return [Joint(self.bones[i - 1], self.bones[i]) for i in range(1, len(self.bones))]
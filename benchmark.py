@@ -0,0 +1,245 @@
+"""
+headless benchmark suite of the environment, replay buffer and learner hot paths.
+results are written as JSON (seconds per operation, lower is better) and can be compared against a baseline file
+"""
+import argparse
+import json
+import logging
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+import tensorflow as tf
+import mlflow
+
+from Environment import Environment
+import noise_generators
+import policy_gradient
+from replay_buffer import PrioritizedBuffer
+import Shape
+
+SEED_VALUE = 42
+PRECISIONS = ('float32', 'float64')
+SHAPES = {'Worm': Shape.Worm, 'Legs': Shape.Legs, 'Tree': Shape.Tree}
+PHYSICAL_STEPS_PER_ACTION = (5, 10, 20)
+BUFFER_CAPACITIES = (1000, 10000, 100000)
+NOISE_ENVIRONMENTS = (1, 16, 64)
+GAMMA = 0.99
+TAU = 0.05
+BUFFER_SIZE = 10000
+BATCH_SIZE = 512
+# a measurement slower than its baseline by more than this fraction is a regression
+DEFAULT_REGRESSION_THRESHOLD = 0.2
+
+
+def seed(value=SEED_VALUE):
+    random.seed(value)
+    np.random.seed(value)
+    tf.random.set_seed(value)
+
+
+def measure(function, repeats, rounds=5):
+    """
+    returns the median over rounds of the mean seconds per call
+    """
+    round_times = []
+    for round_index in range(rounds):
+        start_time = time.perf_counter()
+        for i in range(repeats):
+            function()
+        round_times.append((time.perf_counter() - start_time) / repeats)
+    return float(np.median(round_times))
+
+
+def random_observation(state_size, action_size):
+    return (np.random.normal(size=state_size), np.random.uniform(-1, 1, action_size),
+            np.random.normal(), np.random.normal(size=state_size))
+
+
+def fill_buffer(buffer, state_size, action_size):
+    for i in range(buffer.buffer_capacity):
+        buffer.record(random_observation(state_size, action_size))
+
+
+def build_models(state_size, action_size):
+    return {'actor_model': policy_gradient.get_actor(state_size, action_size),
+            'critic_model': policy_gradient.get_critic(state_size, action_size),
+            'target_actor': policy_gradient.get_actor(state_size, action_size),
+            'target_critic': policy_gradient.get_critic(state_size, action_size)}
+
+
+def benchmark_environment(shape_name, precision, steps):
+    seed()
+    env = Environment(SHAPES[shape_name](), dtype=precision)
+    actions = np.random.uniform(-1, 1, (steps, env.action_size))
+
+    def step():
+        state, reward, done, info = env.step(actions[env.step_index % steps])
+        if done:
+            env.reset()
+
+    return {'env_step/{}/{}'.format(shape_name, precision): measure(step, steps),
+            'env_reset/{}/{}'.format(shape_name, precision): measure(env.reset, steps // 10)}
+
+
+def benchmark_physics(shape_name, physical_steps, steps):
+    """
+    env step time and per step bullet statistics of a shape with the given physical steps per action
+    """
+    seed()
+    environment_class = type('BenchmarkEnvironment', (Environment,), {'PHYSICAL_STEPS_PER_ACTION': physical_steps,
+                                                                       'PHYSICS_STATISTICS': True})
+    env = environment_class(SHAPES[shape_name]())
+    actions = np.random.uniform(-1, 1, (steps, env.action_size))
+
+    def step():
+        state, reward, done, info = env.step(actions[env.step_index % steps])
+        if done:
+            env.reset()
+
+    name = 'physics_env_step/{}/{}'.format(shape_name, physical_steps)
+    step_time = measure(step, steps, rounds=1)
+    return {name: step_time}, {name: env.physics.pop_statistics()}
+
+
+def benchmark_buffer(capacity, precision, repeats):
+    seed()
+    tf.keras.backend.set_floatx(precision)
+    env = Environment(Shape.Worm(), dtype=precision)
+    buffer = PrioritizedBuffer(env.state_size, env.action_size, GAMMA, capacity, BATCH_SIZE, dtype=precision)
+    observation = random_observation(env.state_size, env.action_size)
+    results = {'buffer_record/{}/{}'.format(capacity, precision): measure(lambda: buffer.record(observation), repeats)}
+    fill_buffer(buffer, env.state_size, env.action_size)
+
+    models = build_models(env.state_size, env.action_size)
+    results['buffer_sample/{}/{}'.format(capacity, precision)] = measure(buffer.sample, repeats)
+    results['buffer_prioritize/{}/{}'.format(capacity, precision)] = measure(
+        lambda: buffer.prioritize_buffer(models['target_actor'], models['critic_model'], models['target_critic']),
+        1, rounds=3)
+    return results
+
+
+def benchmark_learner(precision, repeats):
+    seed()
+    tf.keras.backend.set_floatx(precision)
+    env = Environment(Shape.Worm(), dtype=precision)
+    models = build_models(env.state_size, env.action_size)
+    actor_optimizer = tf.keras.optimizers.RMSprop()
+    critic_optimizer = tf.keras.optimizers.RMSprop()
+    buffer = PrioritizedBuffer(env.state_size, env.action_size, GAMMA, BUFFER_SIZE, BATCH_SIZE, dtype=precision)
+    fill_buffer(buffer, env.state_size, env.action_size)
+
+    def learn():
+        buffer.learn(models['actor_model'], models['target_actor'], models['critic_model'], models['target_critic'],
+                     actor_optimizer, critic_optimizer)
+
+    def update_target_models():
+        policy_gradient.update_target(models['target_critic'], models['critic_model'], TAU)
+        policy_gradient.update_target(models['target_actor'], models['actor_model'], TAU)
+
+    # the first calls trace the tf.functions and are not part of the measurement
+    learn()
+    update_target_models()
+    return {'learn/{}'.format(precision): measure(learn, repeats),
+            'update_target_models/{}'.format(precision): measure(update_target_models, repeats)}
+
+
+def benchmark_noise(num_envs, action_size, repeats):
+    addative_noise_generator = noise_generators.OUActionNoise(action_size, num_envs=num_envs, seed=SEED_VALUE)
+    multiplier_noise_generator = noise_generators.MarkovSaltPepperNoise(action_size, num_envs=num_envs,
+                                                                        seed=SEED_VALUE)
+
+    def noise():
+        addative_noise_generator()
+        multiplier_noise_generator()
+
+    # per environment, so a flat value across environment counts means the noise cost does not grow with them
+    return {'noise_step_per_env/{}'.format(num_envs): measure(noise, repeats) / num_envs}
+
+
+def get_metadata():
+    try:
+        commit = subprocess.check_output(['git', 'rev-parse', 'HEAD'], stderr=subprocess.DEVNULL).decode().strip()
+    except Exception:
+        commit = None
+    return {'commit': commit, 'time': time.strftime('%Y-%m-%dT%H:%M:%S'), 'python': platform.python_version(),
+            'platform': platform.platform(), 'numpy': np.__version__, 'tensorflow': tf.__version__}
+
+
+def run_suite(precisions, steps, repeats, capacities):
+    """
+    returns the timing results and the physics statistics of the physics benchmarks
+    """
+    results = {}
+    physics = {}
+    for shape_name in SHAPES:
+        for physical_steps in PHYSICAL_STEPS_PER_ACTION:
+            logging.info('Benchmarking physics of {} with {} steps per action'.format(shape_name, physical_steps))
+            shape_results, shape_physics = benchmark_physics(shape_name, physical_steps, steps)
+            results.update(shape_results)
+            physics.update(shape_physics)
+    for num_envs in NOISE_ENVIRONMENTS:
+        results.update(benchmark_noise(num_envs, len(Shape.Legs().joints), repeats * 10))
+    for precision in precisions:
+        for shape_name in SHAPES:
+            logging.info('Benchmarking environment {} ({})'.format(shape_name, precision))
+            results.update(benchmark_environment(shape_name, precision, steps))
+        for capacity in capacities:
+            logging.info('Benchmarking replay buffer of capacity {} ({})'.format(capacity, precision))
+            results.update(benchmark_buffer(capacity, precision, repeats))
+        logging.info('Benchmarking learner ({})'.format(precision))
+        results.update(benchmark_learner(precision, repeats))
+    return results, physics
+
+
+def find_regressions(results, baseline_results, threshold):
+    regressions = {}
+    for name, value in results.items():
+        baseline_value = baseline_results.get(name)
+        if baseline_value and value > baseline_value * (1 + threshold):
+            regressions[name] = {'value': value, 'baseline': baseline_value, 'ratio': value / baseline_value}
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--precision', choices=PRECISIONS, nargs='+', default=PRECISIONS)
+    parser.add_argument('--steps', type=int, default=1000, help='environment steps per measurement round')
+    parser.add_argument('--repeats', type=int, default=50, help='buffer and learner calls per measurement round')
+    parser.add_argument('--capacities', type=int, nargs='+', default=BUFFER_CAPACITIES)
+    parser.add_argument('--output', help='path of the JSON results file, printed to stdout if not given')
+    parser.add_argument('--baseline', help='JSON results file of a previous run to compare against')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_REGRESSION_THRESHOLD,
+                        help='allowed slowdown fraction relative to the baseline')
+    args = parser.parse_args()
+    logging.basicConfig(format='%(asctime)-15s [%(levelname)s]: %(message)s', level=logging.INFO)
+    # the learner logs metrics on every update, keep them away from the real runs
+    mlflow.set_tracking_uri('file://' + tempfile.mkdtemp())
+
+    results, physics = run_suite(args.precision, args.steps, args.repeats, args.capacities)
+    report = {'metadata': get_metadata(), 'unit': 'seconds per call', 'results': results, 'physics': physics}
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            baseline = json.load(baseline_file)
+        report['baseline_commit'] = baseline['metadata'].get('commit')
+        report['regressions'] = find_regressions(report['results'], baseline['results'], args.threshold)
+        for name, regression in report['regressions'].items():
+            logging.warning('Regression in {}: {:0.6f} sec vs {:0.6f} sec ({:0.2f}x)'.format(
+                name, regression['value'], regression['baseline'], regression['ratio']))
+
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            json.dump(report, output_file, indent=2, sort_keys=True)
+        logging.info('Results written to {}'.format(args.output))
+    else:
+        print(json.dumps(report, indent=2, sort_keys=True))
+    if report.get('regressions'):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
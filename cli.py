@@ -0,0 +1,103 @@
+"""
+entry point of the walker tools, heavy subsystems are imported only by the commands that use them:
+    python cli.py train
+    python cli.py benchmark [--output results.json ...]
+    python cli.py sweep space.json [...]
+    python cli.py view trajectory.bin [--follow ...]
+    python cli.py imports
+"""
+import argparse
+import importlib
+import logging
+import subprocess
+import sys
+import time
+
+import resources
+
+# command -> (module, heavy subsystems it imports)
+COMMANDS = {
+    'train': ('main', ('numpy', 'physics', 'tensorflow', 'mlflow')),
+    'benchmark': ('benchmark', ('numpy', 'physics', 'tensorflow', 'mlflow')),
+    'sweep': ('sweep', ()),
+    'view': ('trajectory_viewer', ('numpy', 'display')),
+}
+# command -> (process role, processes of each role in its process tree), the sweep lays out its own trials
+COMMAND_ROLES = {
+    'train': ('learner', resources.DEFAULT_ROLE_COUNTS),
+    'benchmark': ('learner', {'learner': 1}),
+    'view': ('viewer', {'viewer': 1}),
+}
+SUBSYSTEMS = {
+    'numpy': 'numpy',
+    'physics': 'panda3d.bullet',
+    'display': 'direct.showbase.ShowBase',
+    'tensorflow': 'tensorflow',
+    'mlflow': 'mlflow',
+    'keyboard': 'keyboard',
+}
+# modules of the project whose standalone import time is reported by the imports command
+PROJECT_MODULES = ('Environment', 'replay_buffer', 'policy_gradient', 'ddpg')
+
+
+def timed_import(module_name):
+    start_time = time.perf_counter()
+    importlib.import_module(module_name)
+    return time.perf_counter() - start_time
+
+
+def import_command(command):
+    """
+    imports the command's subsystems one by one and then its module, and logs the time of each.
+    a subsystem's time includes the dependencies it is the first to import
+    """
+    module_name, subsystems = COMMANDS[command]
+    import_times = [(subsystem, timed_import(SUBSYSTEMS[subsystem])) for subsystem in subsystems]
+    import_times.append((module_name, timed_import(module_name)))
+    for name, import_time in import_times:
+        logging.info('import {:<20} {:0.3f} sec'.format(name, import_time))
+    logging.info('import {:<20} {:0.3f} sec'.format('total', sum(import_time for name, import_time in import_times)))
+
+
+def measure_fresh_import(module_name):
+    # a fresh interpreter, so the time includes everything the module imports
+    code = 'import time; start_time = time.perf_counter(); import {}; print(time.perf_counter() - start_time)'
+    result = subprocess.run([sys.executable, '-c', code.format(module_name)], capture_output=True, text=True)
+    if result.returncode != 0:
+        return None
+    return float(result.stdout.strip().splitlines()[-1])
+
+
+def report_imports():
+    for name, module_name in list(SUBSYSTEMS.items()) + [(name, name) for name in PROJECT_MODULES]:
+        import_time = measure_fresh_import(module_name)
+        if import_time is None:
+            logging.info('import {:<20} failed'.format(name))
+        else:
+            logging.info('import {:<20} {:0.3f} sec'.format(name, import_time))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--import-times', action='store_true', help='log the import time of each subsystem')
+    parser.add_argument('command', choices=sorted(COMMANDS) + ['imports'])
+    parser.add_argument('args', nargs=argparse.REMAINDER, help='arguments of the command')
+    args = parser.parse_args()
+    logging.basicConfig(format='%(asctime)-15s [%(levelname)s]: %(message)s', level=logging.INFO)
+
+    if args.command == 'imports':
+        report_imports()
+        return
+    if args.command in COMMAND_ROLES:
+        # before any heavy import, the thread pools are sized on import
+        resources.configure_process(*COMMAND_ROLES[args.command])
+    if args.import_times:
+        import_command(args.command)
+    module_name, subsystems = COMMANDS[args.command]
+    # the command parses its own arguments
+    sys.argv = ['{} {}'.format(sys.argv[0], args.command)] + args.args
+    importlib.import_module(module_name).main()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,407 @@
+# original source:
+# https://raw.githubusercontent.com/keras-team/keras-io/master/examples/rl/ddpg_pendulum.py
+import logging
+import os
+import tensorflow as tf
+
+import numpy as np
+import time
+from Environment import Environment
+import policy_gradient
+import noise_generators
+from evaluation import EvaluationPool
+from replay_buffer import PrioritizedBuffer
+import Shape
+import profiling
+import resources
+from memory_monitor import MemoryMonitor
+from training_schedule import TrainingSchedule
+import mlflow
+
+SEED_VALUE = 42
+
+
+def configure():
+    np.random.seed(SEED_VALUE)
+    tf.random.set_seed(SEED_VALUE)
+    np.set_printoptions(formatter={'float': lambda x: "{0:0.2f}".format(x)})
+    logging.basicConfig(format='%(asctime)-15s [%(levelname)s]: %(message)s', level=logging.INFO)
+
+
+class DDPG:
+    GAMMA = 0.99
+    TAU = 0.05
+    CRITIC_LR = 0.002
+    ACTOR_LR = 0.001
+    MAX_EPISODES = 10000000
+    BUFFER_SIZE = 10000
+    BATCH_SIZE = 512
+    NO_NOISE_TEST_EPISODES = 3
+    EVALUATION_INTERVAL = 10
+    EVALUATION_WORKERS = resources.DEFAULT_ROLE_COUNTS['evaluator']
+    MAX_NOISE_LEVEL = 0.1
+    # update-to-data schedule: no learning during the warm-up steps, then UPDATES_PER_CYCLE gradient updates every
+    # ENV_STEPS_PER_CYCLE environment steps, and a target update every TARGET_UPDATE_INTERVAL gradient updates.
+    # None warms up for BATCH_SIZE steps, resolved when the learner is built so a changed BATCH_SIZE is followed
+    LEARNING_WARMUP_STEPS = None
+    UPDATES_PER_CYCLE = 1
+    ENV_STEPS_PER_CYCLE = 1
+    TARGET_UPDATE_INTERVAL = 1
+    # adapts UPDATES_PER_CYCLE so that LEARN_TIME_FRACTION of the time is spent on gradient updates
+    ADAPTIVE_UPDATES = False
+    LEARN_TIME_FRACTION = 0.5
+    # 'float32' halves the bytes moved by the environment states, the replay buffer and the models
+    PRECISION = 'float64'
+    # per-phase timing of every step, reported per episode
+    PHASE_TIMERS = True
+    # per step bullet statistics of the training environment, reported per episode
+    PHYSICS_STATISTICS = True
+    # episodes between memory samples, 0 disables the memory monitor
+    MEMORY_MONITOR_INTERVAL = 0
+    # RSS growth in MB per episode that triggers a warning
+    MEMORY_GROWTH_WARNING = 1.0
+    # path of a trajectory file to record every step into, watch it with trajectory_viewer.py
+    TRAJECTORY_PATH = None
+    # keyboard control of the run, see process_keyboard
+    KEYBOARD_CONTROL = True
+    MODEL_NAMES = ('actor_model', 'critic_model', 'target_actor', 'target_critic')
+
+    def __init__(self):
+        # must be set before any model is built
+        tf.keras.backend.set_floatx(self.PRECISION)
+
+        self.timer = profiling.PhaseTimer(enabled=self.PHASE_TIMERS)
+        self.walker = Shape.Worm()
+        self.env = Environment(self.walker, dtype=self.PRECISION, timer=self.timer)
+        self.env.physics.collect_statistics = self.PHYSICS_STATISTICS
+        self.checkpoint_dir = os.path.join(os.path.dirname(__file__), 'mlflow')
+        self.best_run = 0
+        self.addative_noise_generator = noise_generators.OUActionNoise(output_size=self.env.action_size,
+                                                                       seed=SEED_VALUE)
+        self.multiplier_noise_generator = noise_generators.MarkovSaltPepperNoise(output_size=self.env.action_size,
+                                                                                 seed=SEED_VALUE + 1)
+
+        self.init_models()
+
+        self.target_actor.set_weights(self.actor_model.get_weights())
+        self.target_critic.set_weights(self.critic_model.get_weights())
+
+        self.critic_optimizer = tf.keras.optimizers.RMSprop(learning_rate=self.CRITIC_LR)
+        self.actor_optimizer = tf.keras.optimizers.RMSprop(learning_rate=self.ACTOR_LR)
+        self.learning_warmup_steps = self.BATCH_SIZE if self.LEARNING_WARMUP_STEPS is None \
+            else self.LEARNING_WARMUP_STEPS
+        self.training_schedule = TrainingSchedule(self.learning_warmup_steps, self.UPDATES_PER_CYCLE,
+                                                  self.ENV_STEPS_PER_CYCLE, self.TARGET_UPDATE_INTERVAL,
+                                                  self.ADAPTIVE_UPDATES, self.LEARN_TIME_FRACTION)
+        self.buffer = PrioritizedBuffer(self.env.state_size, self.env.action_size,
+                                        self.GAMMA, self.BUFFER_SIZE, self.BATCH_SIZE, dtype=self.PRECISION,
+                                        timer=self.timer)
+
+        self.episode_reward_history = []
+        # show controls the appearance of a window with graphics, controlled by 's' and 'a' on the keyboard
+        self.show = False
+        # show controls if the model is learning or not, affects the FPS of the graphics
+        # controlled by 'l' and 'k' on the keyboard
+        self.learn = True
+        # set to end run_multiple_episodes after the current episode, e.g. by early stopping of a sweep
+        self.stop_requested = False
+        self.evaluation_pool = EvaluationPool(self.walker, self.EVALUATION_WORKERS, self.NO_NOISE_TEST_EPISODES,
+                                              seed=SEED_VALUE, precision=self.PRECISION,
+                                              worker_cpus=resources.get_role_cpus('evaluator'),
+                                              environment_constants=self.get_environment_constants())
+        if self.TRAJECTORY_PATH:
+            self.env.physics.start_recording(self.TRAJECTORY_PATH)
+        self.memory_monitor = MemoryMonitor(self.MEMORY_MONITOR_INTERVAL, self.MEMORY_GROWTH_WARNING) \
+            if self.MEMORY_MONITOR_INTERVAL > 0 else None
+        self.log_params()
+
+    @staticmethod
+    def get_environment_constants():
+        # the current values, including the ones changed at runtime e.g. by a sweep
+        return {name: value for name, value in vars(Environment).items() if name.isupper()}
+
+    def init_models(self):
+        self.actor_model = policy_gradient.get_actor(self.env.state_size, self.env.action_size)
+        self.critic_model = policy_gradient.get_critic(self.env.state_size, self.env.action_size)
+        self.target_actor = policy_gradient.get_actor(self.env.state_size, self.env.action_size)
+        self.target_critic = policy_gradient.get_critic(self.env.state_size, self.env.action_size)
+
+    def log_params(self):
+        mlflow.log_param('GAMMA', self.GAMMA)
+        mlflow.log_param('TAU', self.TAU)
+        mlflow.log_param('CRITIC_LR', self.CRITIC_LR)
+        mlflow.log_param('ACTOR_LR', self.ACTOR_LR)
+        mlflow.log_param('MAX_EPISODES', self.MAX_EPISODES)
+        mlflow.log_param('BUFFER_SIZE', self.BUFFER_SIZE)
+        mlflow.log_param('BATCH_SIZE', self.BATCH_SIZE)
+        mlflow.log_param('NO_NOISE_TEST_EPISODES', self.NO_NOISE_TEST_EPISODES)
+        mlflow.log_param('EVALUATION_INTERVAL', self.EVALUATION_INTERVAL)
+        mlflow.log_param('EVALUATION_WORKERS', self.EVALUATION_WORKERS)
+        mlflow.log_param('MAX_NOISE_LEVEL', self.MAX_NOISE_LEVEL)
+        mlflow.log_param('LEARNING_WARMUP_STEPS', self.learning_warmup_steps)
+        mlflow.log_param('UPDATES_PER_CYCLE', self.UPDATES_PER_CYCLE)
+        mlflow.log_param('ENV_STEPS_PER_CYCLE', self.ENV_STEPS_PER_CYCLE)
+        mlflow.log_param('TARGET_UPDATE_INTERVAL', self.TARGET_UPDATE_INTERVAL)
+        mlflow.log_param('ADAPTIVE_UPDATES', self.ADAPTIVE_UPDATES)
+        mlflow.log_param('LEARN_TIME_FRACTION', self.LEARN_TIME_FRACTION)
+        mlflow.log_param('PRECISION', self.PRECISION)
+        mlflow.log_param('PHASE_TIMERS', self.PHASE_TIMERS)
+        mlflow.log_param('PHYSICS_STATISTICS', self.PHYSICS_STATISTICS)
+        mlflow.log_param('MEMORY_MONITOR_INTERVAL', self.MEMORY_MONITOR_INTERVAL)
+
+        mlflow.log_param('JOINT_POWER', self.env.JOINT_POWER)
+        mlflow.log_param('JOINT_SPEED', self.env.JOINT_SPEED)
+        mlflow.log_param('PLANE_FRICTION', self.env.PLANE_FRICTION)
+        mlflow.log_param('GRAVITY_ACCELERATION', self.env.GRAVITY_ACCELERATION)
+        mlflow.log_param('ANGLE_SCALE', self.env.ANGLE_SCALE)
+        mlflow.log_param('PHYSICAL_STEPS_PER_ACTION', self.env.PHYSICAL_STEPS_PER_ACTION)
+        mlflow.log_param('SHAPE', type(self.walker).__name__)
+        mlflow.log_param('MAX_STEPS_PER_EPISODE', self.env.MAX_STEPS_PER_EPISODE)
+        mlflow.log_param('MAX_STABILITY_STEPS', self.env.MAX_STABILITY_STEPS)
+        mlflow.log_param('MIN_MOVEMENT_FOR_STABILITY', self.env.MIN_MOVEMENT_FOR_STABILITY)
+        mlflow.log_param('LAST_VELOCITY_HISTORY_SIZE', self.env.LAST_VELOCITY_HISTORY_SIZE)
+        mlflow.log_param('LAST_VELOCITY_AVERAGE_INIT', self.env.LAST_VELOCITY_AVERAGE_INIT)
+        mlflow.log_param('MIN_MOVEMENT_FOR_END_EPISODE', self.env.MIN_MOVEMENT_FOR_END_EPISODE)
+        mlflow.log_param('TIME_STEP_REWARD', self.env.TIME_STEP_REWARD)
+        mlflow.log_param('VELOCITY_REWARD', self.env.VELOCITY_REWARD)
+        mlflow.log_param('VELOCITY_DECREASE_PENALTY', self.env.VELOCITY_DECREASE_PENALTY)
+        mlflow.log_param('SIDE_PROGRESS_PENALTY', self.env.SIDE_PROGRESS_PENALTY)
+        mlflow.log_param('ACTUATOR_PENALTY', self.env.ACTUATOR_PENALTY)
+        mlflow.log_param('OVER_PRESS_JOINT_PENALTY', self.env.OVER_PRESS_JOINT_PENALTY)
+
+    def get_critic_value(self, state, action):
+        state = tf.expand_dims(tf.convert_to_tensor(state), 0)
+        action = tf.expand_dims(tf.convert_to_tensor(action, dtype=self.PRECISION), 0)
+        return self.critic_model([state, action])[0][0]
+
+    def update_target_models(self):
+        policy_gradient.update_target(self.target_critic, self.critic_model, self.TAU)
+        policy_gradient.update_target(self.target_actor, self.actor_model, self.TAU)
+
+    def policy(self, state):
+        with self.timer.phase('inference'):
+            sampled_actions = tf.squeeze(self.actor_model(state)).numpy()
+        # for i, val in enumerate(sampled_actions):
+        #     mlflow.log_metric('action_unnoised_{}'.format(i), val)
+        noised_sampled_actions = sampled_actions
+
+        if self.learn:
+            with self.timer.phase('noise'):
+                # the generators hold the noise of a single environment
+                addative_noise = self.addative_noise_generator()[0]
+                multiplier_noise = self.multiplier_noise_generator()[0]
+                noised_sampled_actions = (noised_sampled_actions + addative_noise) * multiplier_noise
+            logging.debug('action {}, noise mul: {}, noise add: {}, total: {}'.format(sampled_actions,
+                                                                                      multiplier_noise, addative_noise,
+                                                                                      noised_sampled_actions))
+
+        legal_action = np.clip(noised_sampled_actions, -1, 1)
+        # for i, val in enumerate(legal_action):
+        #     mlflow.log_metric('action_noised_{}'.format(i), val)
+        return np.squeeze(legal_action).astype(self.PRECISION)
+
+    def apply_keyboard_input_on_action(self, action):
+        import keyboard
+        for i in range(min(len(action), 10)):
+            if keyboard.is_pressed(str(i)):
+                logging.debug('keyboard input detected')
+                if keyboard.is_pressed('up arrow'):
+                    action[i] = 1
+                if keyboard.is_pressed('down arrow'):
+                    action[i] = -1
+        if keyboard.is_pressed('q'):
+            raise Exception('Keyboard Quit')
+        return action
+
+    def episode(self, learn, episode_index):
+        prev_state = self.env.reset()
+        total_episode_reward = 0
+        reward = 0
+        critic_loss = 0
+        actor_loss = 0
+        done = False
+        while not done:
+            step_start_time = time.perf_counter()
+            prev_state_tensor = tf.expand_dims(tf.convert_to_tensor(prev_state), 0)
+            action = self.policy(prev_state_tensor)
+            if self.KEYBOARD_CONTROL:
+                action = self.process_keyboard(action)
+            state, reward, done, info = self.env.step(action)
+            with self.timer.phase('record'):
+                self.buffer.record((prev_state, action, reward, state))
+            total_episode_reward += reward
+
+            if self.learn:
+                learn_start_time = time.perf_counter()
+                updates = self.training_schedule.get_updates()
+                for i in range(updates):
+                    actor_loss, critic_loss = self.buffer.learn(self.actor_model, self.target_actor,
+                                                                self.critic_model, self.target_critic,
+                                                                self.actor_optimizer, self.critic_optimizer)
+                    if self.training_schedule.update_done():
+                        with self.timer.phase('target_update'):
+                            self.update_target_models()
+                self.training_schedule.record_times(learn_start_time - step_start_time,
+                                                    time.perf_counter() - learn_start_time, updates)
+            with self.timer.phase('debug_info'):
+                critic_value = self.get_critic_value(state, action)
+                debug_string = '\n'.join((
+                    "Episode: {} [{}]".format(episode_index, self.env.step_index),
+                    'Episode Reward: {:0.1f} [{:0.1f}]'.format(total_episode_reward, reward),
+                    'Episode Distance: {:0.1f}'.format(self.env.get_score()),
+                    'Velocity: {:0.1f}'.format(self.env.get_walker_x_velocity()),
+                    'Critic Value: {:0.1f}'.format(critic_value),
+                    'Action: ' + ', '.join(['{:+0.1f}'.format(i) for i in action]),
+                ))
+                if self.learn:
+                    debug_string += '\nCritic Loss: {:0.1f}'.format(critic_loss)
+                    debug_string += '\nActor Loss: {:0.1f}'.format(actor_loss)
+                logging.debug(debug_string)
+            if self.show:
+                with self.timer.phase('render'):
+                    self.render(debug_string)
+            prev_state = state
+        return total_episode_reward, self.env.step_index
+
+    def render(self, debug_string):
+        self.env.render(debug_string)
+
+    def process_keyboard(self, action):
+        # imported only by the keyboard controlled runs
+        import keyboard
+        if keyboard.is_pressed('d'):
+            logging.getLogger().setLevel(logging.DEBUG)
+        if keyboard.is_pressed('i'):
+            logging.getLogger().setLevel(logging.INFO)
+
+        if keyboard.is_pressed('l'):
+            self.learn = True
+        if keyboard.is_pressed('k'):
+            self.learn = False
+
+        if keyboard.is_pressed('o'):
+            self.load_models()
+
+        if keyboard.is_pressed('s'):
+            if not self.show:
+                self.env.open_window()
+            self.show = True
+        if keyboard.is_pressed('a'):
+            if self.show:
+                self.env.close_window()
+            self.show = False
+        action = self.apply_keyboard_input_on_action(action)
+        return action
+
+    def run_multiple_episodes(self):
+        try:
+            for episode_index in range(self.MAX_EPISODES):
+                if self.stop_requested:
+                    logging.info('Stopping after {} episodes'.format(episode_index))
+                    break
+                start_time = time.time()
+                total_episode_reward, steps = self.episode(self.learn, episode_index)
+
+                self.episode_reward_history.append(total_episode_reward)
+                pace = (time.time() - start_time) / steps
+                average_reward = np.mean(self.episode_reward_history[-10:])
+                logging.info("Episode {}: Steps: {} [{:0.2f} sec/step] Avg Reward: {:0.1f}".format(episode_index,
+                                                                                                   steps, pace,
+                                                                                                   average_reward))
+                mlflow.log_metric('episode_step_pace', pace)
+                mlflow.log_metric('episode_reward', total_episode_reward)
+                mlflow.log_metric('episode_reward_smoothed', average_reward)
+                mlflow.log_metric('episode_step_count', steps)
+                mlflow.log_metric('updates_per_cycle', self.training_schedule.updates_per_cycle)
+                self.log_profiling(episode_index, steps)
+                mlflow.log_metrics(self.env.physics.pop_statistics(), step=episode_index)
+                if self.memory_monitor is not None and self.memory_monitor.is_due(episode_index):
+                    self.log_memory(episode_index)
+                if episode_index % self.EVALUATION_INTERVAL == 0:
+                    self.buffer.prioritize_buffer(self.target_actor, self.critic_model, self.target_critic)
+                    mlflow.keras.log_model(self.target_actor, 'target_actor')
+                    mlflow.keras.log_model(self.target_critic, 'target_critic')
+                    mlflow.keras.log_model(self.actor_model, 'actor_model')
+                    mlflow.keras.log_model(self.critic_model, 'critic_model')
+                    # the evaluation runs on a snapshot of the weights, the learner keeps training meanwhile
+                    self.evaluation_pool.submit(episode_index, self.target_actor.get_weights(),
+                                                context=self.get_models_weights())
+                for result in self.evaluation_pool.collect():
+                    self.on_evaluation_result(*result)
+            if not self.stop_requested:
+                # the last snapshots are still scored, checkpointed and reported, an early stop drops them
+                for result in self.evaluation_pool.collect(wait=True):
+                    self.on_evaluation_result(*result)
+        finally:
+            # only evaluations of an early stop or of a failed run are left to terminate
+            self.evaluation_pool.close()
+            self.env.physics.stop_recording()
+
+    def log_profiling(self, episode_index, steps):
+        mlflow.log_metrics(self.timer.summary(steps), step=episode_index)
+        for name, count in profiling.TRACE_COUNTS.items():
+            mlflow.log_metric('retraces_{}'.format(name), count, step=episode_index)
+        self.timer.reset()
+
+    def log_memory(self, episode_index):
+        metrics = self.memory_monitor.sample(episode_index, {
+            'replay_buffer_mb': self.buffer.nbytes / 1024 ** 2,
+            'episode_reward_history_length': len(self.episode_reward_history),
+        })
+        mlflow.log_metrics(metrics, step=episode_index)
+        top_allocators = self.memory_monitor.get_top_allocators()
+        if top_allocators:
+            mlflow.log_text('\n'.join(top_allocators), 'memory/top_allocators_{}.txt'.format(episode_index))
+
+    def on_evaluation_result(self, episode_index, average_reward_test, models_weights):
+        self.noise_level = min(self.MAX_NOISE_LEVEL, 500 / max(np.finfo(float).eps, average_reward_test) ** 0.5)
+        self.addative_noise_generator.set_params(std_deviation=90 * self.noise_level)
+        self.multiplier_noise_generator.set_params(salt_to_pepper=self.noise_level)
+
+        if average_reward_test > self.best_run:
+            self.best_run = average_reward_test
+            self.save_models(models_weights)
+        else:
+            self.load_models()
+        logging.info(
+            "Test Episodes {}: Avg Reward: {:0.1f} (best: {:0.1f})".format(episode_index,
+                                                                           average_reward_test,
+                                                                           self.best_run))
+        # mlflow.log_metric('episode_noise_level', noise_level)
+        mlflow.log_metric('episode_reward_test', average_reward_test)
+        mlflow.log_metric('best_run', self.best_run)
+
+    def get_models_weights(self):
+        return {name: getattr(self, name).get_weights() for name in self.MODEL_NAMES}
+
+    def load_models(self):
+        try:
+            models = {name: self.load_model(name) for name in self.MODEL_NAMES}
+            for name, model in models.items():
+                setattr(self, name, model)
+            logging.info("Weights loaded from {}".format(self.checkpoint_dir))
+        except Exception:
+            logging.warning("Weights couldn't be loaded from {}".format(self.checkpoint_dir))
+            pass
+
+    def load_model(self, name):
+        model = tf.keras.models.load_model(os.path.join(self.checkpoint_dir, name))
+        if model.dtype == self.PRECISION:
+            return model
+        # a checkpoint of a run in another precision, rebuilt in the current one
+        logging.info("Casting {} from {} to {}".format(name, model.dtype, self.PRECISION))
+        builder = policy_gradient.get_actor if 'actor' in name else policy_gradient.get_critic
+        cast_model = builder(self.env.state_size, self.env.action_size)
+        cast_model.set_weights([weights.astype(self.PRECISION) for weights in model.get_weights()])
+        return cast_model
+
+    def save_models(self, models_weights=None):
+        # models_weights allows saving an older snapshot of the weights, without touching the learning models
+        for name in self.MODEL_NAMES:
+            model = getattr(self, name)
+            if models_weights is not None:
+                model = tf.keras.models.clone_model(model)
+                model.set_weights(models_weights[name])
+            tf.keras.models.save_model(model, os.path.join(self.checkpoint_dir, name))
+        logging.info("Weights saved to {}".format(self.checkpoint_dir))
+
@@ -0,0 +1,96 @@
+import logging
+import multiprocessing
+
+import numpy as np
+import tensorflow as tf
+
+from Environment import Environment
+import policy_gradient
+import resources
+
+# per-process state of an evaluation worker, created once by init_worker
+_worker_env = None
+_worker_actor = None
+
+
+def init_worker(walker, seed, precision, worker_cpus, worker_counter, environment_constants):
+    global _worker_env, _worker_actor
+    if worker_cpus:
+        # each worker takes the CPUs of the next evaluator of the layout, a replaced worker reuses them in turn
+        with worker_counter.get_lock():
+            worker_index = worker_counter.value
+            worker_counter.value += 1
+        resources.apply_role('evaluator', worker_cpus[worker_index % len(worker_cpus)], threads=1)
+    np.random.seed(seed)
+    tf.random.set_seed(seed)
+    tf.keras.backend.set_floatx(precision)
+    # the class constants changed in the parent process are not inherited by a spawned worker
+    for name, value in (environment_constants or {}).items():
+        setattr(Environment, name, value)
+    _worker_env = Environment(walker, dtype=precision)
+    # nobody reports the statistics of the evaluation episodes
+    _worker_env.physics.collect_statistics = False
+    _worker_actor = policy_gradient.get_actor(_worker_env.state_size, _worker_env.action_size)
+    logging.debug('Evaluation worker ready')
+
+
+def run_episode(env, actor):
+    state = env.reset()
+    total_episode_reward = 0
+    done = False
+    while not done:
+        action = np.clip(np.squeeze(actor(np.expand_dims(state, 0)).numpy()), -1, 1)
+        state, reward, done, info = env.step(np.atleast_1d(action))
+        total_episode_reward += reward
+    return total_episode_reward
+
+
+def evaluate(actor_weights):
+    """
+    runs a noise-free episode of the given actor weights on the worker's own headless environment
+    """
+    _worker_actor.set_weights(actor_weights)
+    return run_episode(_worker_env, _worker_actor)
+
+
+class EvaluationPool:
+    """
+    evaluates snapshots of the actor in worker processes, so the learner is never blocked by test episodes
+    """
+
+    def __init__(self, walker, processes, episodes, seed=0, precision='float64', worker_cpus=None,
+                 environment_constants=None):
+        """
+        worker_cpus - the CPU affinity set of each worker, see resources.plan_layout
+        environment_constants - {name: value} of the Environment class constants to set in the workers
+        """
+        self.episodes = episodes
+        # tensorflow is not fork safe, the workers start from a fresh interpreter.
+        # the thread counts are set before it imports numpy and tensorflow, through the inherited environment
+        context = multiprocessing.get_context('spawn')
+        with resources.role_environment(threads=1):
+            worker_counter = context.Value('i', 0)
+            self.pool = context.Pool(processes, initializer=init_worker,
+                                     initargs=(walker, seed, precision, worker_cpus, worker_counter,
+                                               environment_constants))
+        self.pending = []
+
+    def submit(self, episode_index, actor_weights, context=None):
+        logging.debug('Submitting evaluation of episode {}'.format(episode_index))
+        # one task per episode, so the episodes of an evaluation are spread over the workers
+        result = self.pool.map_async(evaluate, [actor_weights] * self.episodes, chunksize=1)
+        self.pending.append((episode_index, result, context))
+
+    def collect(self, wait=False):
+        """
+        returns (episode_index, average_reward, context) of the finished evaluations, in submission order
+        """
+        finished = []
+        while self.pending and (wait or self.pending[0][1].ready()):
+            episode_index, result, context = self.pending.pop(0)
+            finished.append((episode_index, np.mean(result.get()), context))
+        return finished
+
+    def close(self):
+        self.pool.terminate()
+        self.pool.join()
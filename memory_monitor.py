@@ -0,0 +1,99 @@
+import gc
+import logging
+import os
+import resource
+import sys
+import tracemalloc
+
+import numpy as np
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+MEGABYTE = 1024 * 1024
+
+
+def get_rss():
+    """
+    resident set size of the current process in bytes
+    """
+    if psutil is not None:
+        return psutil.Process().memory_info().rss
+    try:
+        with open('/proc/self/statm') as statm:
+            return int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except OSError:
+        # peak instead of current usage, in kilobytes on linux
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def count_tf_objects():
+    # only count when tensorflow is already in use, never import it for the monitor
+    tf = sys.modules.get('tensorflow')
+    if tf is None:
+        return {}
+    tensors = 0
+    variables = 0
+    for obj in gc.get_objects():
+        if isinstance(obj, tf.Tensor):
+            tensors += 1
+        elif isinstance(obj, tf.Variable):
+            variables += 1
+    return {'tf_tensor_count': tensors, 'tf_variable_count': variables}
+
+
+class MemoryMonitor:
+    """
+    samples the memory usage every interval episodes and warns when the RSS grows faster than
+    growth_threshold megabytes per episode, measured over the last window samples
+    """
+
+    def __init__(self, interval, growth_threshold=1.0, window=10, top_allocators=10):
+        self.interval = interval
+        self.growth_threshold = growth_threshold
+        self.window = window
+        self.top_allocators = top_allocators
+        self.samples = []
+        if top_allocators and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def is_due(self, episode_index):
+        return self.interval > 0 and episode_index % self.interval == 0
+
+    def sample(self, episode_index, tracked_sizes=None):
+        """
+        returns the memory metrics of this episode, tracked_sizes are extra named sizes to report,
+        e.g. the replay buffer footprint
+        """
+        rss = get_rss()
+        self.samples.append((episode_index, rss))
+        self.samples = self.samples[-self.window:]
+        metrics = {'memory_rss_mb': rss / MEGABYTE}
+        metrics.update(count_tf_objects())
+        if tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+            metrics['memory_traced_mb'] = current / MEGABYTE
+            metrics['memory_traced_peak_mb'] = peak / MEGABYTE
+        metrics.update(tracked_sizes or {})
+
+        growth_rate = self.get_growth_rate()
+        if growth_rate is not None:
+            metrics['memory_rss_growth_mb_per_episode'] = growth_rate
+            if growth_rate > self.growth_threshold:
+                logging.warning('RSS grows by {:0.2f} MB/episode (threshold {:0.2f}), now {:0.1f} MB'.format(
+                    growth_rate, self.growth_threshold, rss / MEGABYTE))
+        return metrics
+
+    def get_growth_rate(self):
+        if len(self.samples) < 2:
+            return None
+        episodes, rss = np.array(self.samples, dtype=float).T
+        return np.polyfit(episodes, rss / MEGABYTE, 1)[0]
+
+    def get_top_allocators(self):
+        if not tracemalloc.is_tracing():
+            return []
+        statistics = tracemalloc.take_snapshot().statistics('lineno')
+        return [str(statistic) for statistic in statistics[:self.top_allocators]]
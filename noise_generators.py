@@ -1,33 +1,90 @@
 import numpy as np
 
+# number of steps of random numbers drawn at once per environment
+BLOCK_SIZE = 1024
+
+
+class BlockRandom:
+    """
+    pre-generates random blocks of (block_size, num_envs, ...) values, using an independent seeded
+    np.random.Generator for each environment
+    """
+
+    def __init__(self, num_envs, seed=None, block_size=BLOCK_SIZE):
+        self.num_envs = num_envs
+        self.block_size = block_size
+        self.generators = [np.random.default_rng(seed_sequence)
+                           for seed_sequence in np.random.SeedSequence(seed).spawn(num_envs)]
+        self.blocks = {}
+        self.positions = {}
+
+    def next(self, name, draw, shape):
+        """
+        returns the next (num_envs, *shape) values of the named stream, draw(generator, size) fills a block
+        """
+        position = self.positions.get(name, self.block_size)
+        if position == self.block_size:
+            block = self.blocks.get(name)
+            if block is None:
+                block = self.blocks[name] = np.empty((self.block_size, self.num_envs) + shape)
+            for env_index, generator in enumerate(self.generators):
+                block[:, env_index] = draw(generator, (self.block_size,) + shape)
+            position = 0
+        self.positions[name] = position + 1
+        return self.blocks[name][position]
+
 
 class OUActionNoise:
     """
-    Ornstein-Uhlenbeck process
+    Ornstein-Uhlenbeck process, with a (num_envs, output_size) state
     """
 
-    def __init__(self, output_size, mean=0, std_deviation=0.3, theta=1, dt=0.01):
+    def __init__(self, output_size, mean=0, std_deviation=0.3, theta=1, dt=0.01, num_envs=1, seed=None):
         self.theta = theta
-        self.mean = mean * np.ones(output_size)
-        self.previous_x = mean
+        self.mean = mean * np.ones((num_envs, output_size))
+        self.previous_x = self.mean.copy()
         self.std_dev = std_deviation
         self.dt = dt
+        self.random = BlockRandom(num_envs, seed)
+
+    def set_params(self, mean=None, std_deviation=None, theta=None):
+        # changes the process parameters in place, keeping its state and random blocks
+        if mean is not None:
+            self.mean[:] = mean
+        if std_deviation is not None:
+            self.std_dev = std_deviation
+        if theta is not None:
+            self.theta = theta
 
     def __call__(self):
 
         # x = (self.previous_x + self.theta * (self.mean - self.previous_x) * self.dt + (
         #     self.std_dev * np.sqrt(self.dt) * np.random.normal(size=self.mean.shape)))
-        x = self.previous_x + self.dt * (
-            self.theta * (self.mean - self.previous_x) + self.std_dev * np.random.normal(size=self.mean.shape))
-        self.previous_x = x
-        return x
+        normal = self.random.next('normal', lambda generator, size: generator.standard_normal(size),
+                                  self.mean.shape[1:])
+        x = self.previous_x + self.dt * (self.theta * (self.mean - self.previous_x) + self.std_dev * normal)
+        self.previous_x[:] = x
+        return self.previous_x
 
 
 class MarkovSaltPepperNoise:
-    def __init__(self, output_size, salt_to_pepper=0.02, pepper_to_salt=0.1):
+    """
+    multiplier noise, each output switches between 1 (salt) and a random value in [-1.5, -0.5] (pepper),
+    with a (num_envs, output_size) state
+    """
+
+    def __init__(self, output_size, salt_to_pepper=0.02, pepper_to_salt=0.1, num_envs=1, seed=None):
         self.salt_to_pepper = salt_to_pepper
         self.pepper_to_salt = pepper_to_salt
-        self.noise = np.ones(output_size)
+        self.noise = np.ones((num_envs, output_size))
+        self.random = BlockRandom(num_envs, seed)
+
+    def set_params(self, salt_to_pepper=None, pepper_to_salt=None):
+        # changes the switch probabilities in place, keeping the noise state and random blocks
+        if salt_to_pepper is not None:
+            self.salt_to_pepper = salt_to_pepper
+        if pepper_to_salt is not None:
+            self.pepper_to_salt = pepper_to_salt
 
     # def _reward_to_probabilty(self, reward):
     #     MAX_PROB = 0.05
@@ -40,8 +97,11 @@ class MarkovSaltPepperNoise:
 
     def __call__(self):
         # self.salt_to_pepper = self._reward_to_probabilty(reward)
-        switch_salt_to_pepper = np.random.binomial(1, self.salt_to_pepper, self.noise.shape)
-        switch_pepper_to_salt = np.random.binomial(1, self.pepper_to_salt, self.noise.shape)
-        self.noise[(self.noise == 1) & (switch_salt_to_pepper == 1)] = np.random.uniform(low=-1.5, high=-0.5)
-        self.noise[(self.noise != 1) & (switch_pepper_to_salt == 1)] = 1
+        # the switch decisions compare uniform draws to the probabilities, so the blocks stay valid when they change
+        switch = self.random.next('switch', lambda generator, size: generator.random(size), self.noise.shape[1:])
+        # one pepper value per environment and step
+        pepper = self.random.next('pepper', lambda generator, size: generator.uniform(-1.5, -0.5, size), (1,))
+        salt = self.noise == 1
+        self.noise[:] = np.where(salt & (switch < self.salt_to_pepper), pepper, self.noise)
+        self.noise[~salt & (switch < self.pepper_to_salt)] = 1
         return self.noise
@@ -1,6 +1,8 @@
 import numpy as np
 import tensorflow as tf
 
+import profiling
+
 # import matplotlib.pyplot as plt
 
 from tensorflow.keras import layers
@@ -18,8 +20,9 @@ def calc_critic_loss(target_actor, critic_model, target_critic, gamma,
     target_actions = target_actor(next_state_batch)
     target_critic_values = target_critic([next_state_batch, target_actions])
     critic_values = critic_model([state_batch, action_batch])
-    gamma_tf = tf.constant(gamma, dtype=tf.float64)
-    critic_regularization_factor_tf = tf.constant(CRITIC_L2_REG_FACTOR, dtype=tf.float64)
+    # the constants follow the precision of the models, so the loss works in both float32 and float64 modes
+    gamma_tf = tf.constant(gamma, dtype=critic_values.dtype)
+    critic_regularization_factor_tf = tf.constant(CRITIC_L2_REG_FACTOR, dtype=critic_values.dtype)
     critic_losses = critic_loss_tf_function(reward_batch, target_critic_values, gamma_tf,
                                             critic_values, critic_regularization_factor_tf)
     return critic_losses
@@ -27,11 +30,21 @@ def calc_critic_loss(target_actor, critic_model, target_critic, gamma,
 
 @tf.function
 def critic_loss_tf_function(reward_batch, target_critic, gamma, critic_values, critic_regularization_factor_tf):
+    profiling.count_trace('critic_loss_tf_function')
     y = reward_batch + gamma * target_critic
     critic_losses = tf.math.square(y - critic_values) + critic_regularization_factor_tf * tf.math.square(critic_values)
     return critic_losses
 
 
+def update_target(target_model, model, tau):
+    new_weights = []
+    target_variables = target_model.weights
+    for i, variable in enumerate(model.weights):
+        new_weights.append(variable * tau + target_variables[i] * (1 - tau))
+
+    target_model.set_weights(new_weights)
+
+
 def get_actor(state_size, action_size):
     inputs = layers.Input(shape=(state_size,))
     out = layers.Dense(64, activation="relu")(inputs)
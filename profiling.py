@@ -0,0 +1,79 @@
+import collections
+import time
+
+import numpy as np
+
+PERCENTILES = (50, 90, 99)
+
+# number of times each tf.function was traced, updated from within the traced python code
+TRACE_COUNTS = collections.Counter()
+
+
+def count_trace(name):
+    """
+    call from inside a tf.function body: python code there only runs when the function is (re)traced
+    """
+    TRACE_COUNTS[name] += 1
+
+
+class _Phase:
+    def __init__(self, durations):
+        self.durations = durations
+        self.start_time = 0
+
+    def __enter__(self):
+        self.start_time = time.perf_counter()
+
+    def __exit__(self, *exc_info):
+        self.durations.append(time.perf_counter() - self.start_time)
+
+
+class _NullPhase:
+    def __enter__(self):
+        pass
+
+    def __exit__(self, *exc_info):
+        pass
+
+
+class PhaseTimer:
+    """
+    splits a training step into named phases, cheap enough to be always on:
+        with timer.phase('physics'):
+            ...
+    """
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.durations = {}
+        self._phases = {}
+        self._null_phase = _NullPhase()
+
+    def phase(self, name):
+        if not self.enabled:
+            return self._null_phase
+        try:
+            return self._phases[name]
+        except KeyError:
+            self.durations[name] = []
+            self._phases[name] = _Phase(self.durations[name])
+            return self._phases[name]
+
+    def summary(self, steps=None):
+        """
+        percentiles and total of each phase in seconds, and the seconds per step if the step count is given
+        """
+        metrics = {}
+        for name, durations in self.durations.items():
+            if not durations:
+                continue
+            for percentile, value in zip(PERCENTILES, np.percentile(durations, PERCENTILES)):
+                metrics['phase_{}_p{}'.format(name, percentile)] = value
+            metrics['phase_{}_total'.format(name)] = np.sum(durations)
+            if steps:
+                metrics['phase_{}_per_step'.format(name)] = np.sum(durations) / steps
+        return metrics
+
+    def reset(self):
+        for durations in self.durations.values():
+            durations.clear()
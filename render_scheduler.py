@@ -0,0 +1,29 @@
+import time
+
+
+class RenderScheduler:
+    """
+    decides when a frame should be drawn, targeting a display FPS independent of the simulation rate.
+    frames are skipped when the simulation runs faster than the display
+    """
+
+    def __init__(self, fps=30, clock=time.perf_counter):
+        self.clock = clock
+        self.frame_period = 1 / fps
+        self.next_frame_time = 0
+        self.rendered_frames = 0
+        self.skipped_frames = 0
+
+    def is_due(self):
+        if self.clock() >= self.next_frame_time:
+            return True
+        self.skipped_frames += 1
+        return False
+
+    def frame_rendered(self):
+        now = self.clock()
+        self.rendered_frames += 1
+        self.next_frame_time += self.frame_period
+        if self.next_frame_time < now:
+            # too far behind, don't try to catch up with a burst of frames
+            self.next_frame_time = now + self.frame_period
@@ -3,21 +3,29 @@ import tensorflow as tf
 import logging
 import numpy as np
 import mlflow
+from profiling import PhaseTimer
 
 
 class PrioritizedBuffer:
-    def __init__(self, state_size, action_size, gamma, buffer_capacity=100000, batch_size=64):
+    def __init__(self, state_size, action_size, gamma, buffer_capacity=100000, batch_size=64, dtype='float64',
+                 timer=None):
 
         # self.im = plt.imshow(np.zeros((77, 36)), cmap='gray', vmin=-0.5, vmax=0.5)
         self.gamma = gamma
+        self.timer = PhaseTimer(enabled=False) if timer is None else timer
         self.buffer_capacity = buffer_capacity
         self.batch_size = batch_size
         self.buffer_current_size = 0
         self.buffer_write_index = 0
-        self.state_buffer = np.zeros((self.buffer_capacity, state_size))
-        self.action_buffer = np.zeros((self.buffer_capacity, action_size))
-        self.reward_buffer = np.zeros((self.buffer_capacity, 1))
-        self.next_state_buffer = np.zeros((self.buffer_capacity, state_size))
+        self.state_buffer = np.zeros((self.buffer_capacity, state_size), dtype=dtype)
+        self.action_buffer = np.zeros((self.buffer_capacity, action_size), dtype=dtype)
+        self.reward_buffer = np.zeros((self.buffer_capacity, 1), dtype=dtype)
+        self.next_state_buffer = np.zeros((self.buffer_capacity, state_size), dtype=dtype)
+
+    @property
+    def nbytes(self):
+        return self.state_buffer.nbytes + self.action_buffer.nbytes + self.reward_buffer.nbytes + \
+            self.next_state_buffer.nbytes
 
     def record(self, observation):
         # when the buffer is not in full capacity, we fill it from the top
@@ -45,6 +53,17 @@ class PrioritizedBuffer:
         batch_indices = np.random.choice(self.buffer_current_size, self.batch_size, p=sample_probabilities.flatten())
         return batch_indices
 
+    def sample(self):
+        """
+        returns (state_batch, action_batch, reward_batch, next_state_batch) tensors of a prioritized batch
+        """
+        batch_indices = self.get_prioritize_batch_indices()
+        # gather only the batch rows, without copying the whole buffers
+        return tf.convert_to_tensor(self.state_buffer[batch_indices]), \
+            tf.convert_to_tensor(self.action_buffer[batch_indices]), \
+            tf.convert_to_tensor(self.reward_buffer[batch_indices]), \
+            tf.convert_to_tensor(self.next_state_buffer[batch_indices])
+
     def prioritize_buffer(self, target_actor, critic_model, target_critic):
         logging.debug('Prioritizing buffer with {} records'.format(self.buffer_current_size))
         self.buffer_write_index = self.buffer_current_size
@@ -67,32 +86,33 @@ class PrioritizedBuffer:
 
         # Uniform mini-batch sampling:
         # batch_indices = np.random.choice(min(self.buffer_write_index, self.buffer_capacity), self.batch_size)
-        batch_indices = self.get_prioritize_batch_indices()
-        with tf.GradientTape() as tape:
-            critic_losses = policy_gradient.calc_critic_loss(target_actor, critic_model, target_critic, self.gamma,
-                                                             tf.gather(self.state_buffer * 1, batch_indices),
-                                                             tf.gather(self.action_buffer * 1, batch_indices),
-                                                             tf.gather(self.reward_buffer * 1, batch_indices),
-                                                             tf.gather(self.next_state_buffer * 1, batch_indices))
-            critic_loss = tf.math.reduce_mean(critic_losses)
-        critic_grad = tape.gradient(critic_loss, critic_model.trainable_variables)
-        critic_optimizer.apply_gradients(
-            zip(critic_grad, critic_model.trainable_variables)
-        )
+        with self.timer.phase('sample'):
+            state_batch, action_batch, reward_batch, next_state_batch = self.sample()
+        with self.timer.phase('critic_update'):
+            with tf.GradientTape() as tape:
+                critic_losses = policy_gradient.calc_critic_loss(target_actor, critic_model, target_critic,
+                                                                 self.gamma, state_batch, action_batch,
+                                                                 reward_batch, next_state_batch)
+                critic_loss = tf.math.reduce_mean(critic_losses)
+            critic_grad = tape.gradient(critic_loss, critic_model.trainable_variables)
+            critic_optimizer.apply_gradients(
+                zip(critic_grad, critic_model.trainable_variables)
+            )
 
-        state_batch = tf.convert_to_tensor(self.state_buffer[batch_indices])
-        with tf.GradientTape() as tape:
-            actions = actor_model(state_batch)
-            critic_value = critic_model([state_batch, actions])
-            actor_loss = -tf.math.reduce_mean(critic_value)
-            # action_mean_l2 = tf.math.reduce_mean(tf.math.sqrt(tf.math.reduce_sum(tf.math.square(actions), 1)), 0)
-            # + ACTION_L2_REG_FACTOR * action_mean_l2
+        with self.timer.phase('actor_update'):
+            with tf.GradientTape() as tape:
+                actions = actor_model(state_batch)
+                critic_value = critic_model([state_batch, actions])
+                actor_loss = -tf.math.reduce_mean(critic_value)
+                # action_mean_l2 = tf.math.reduce_mean(tf.math.sqrt(tf.math.reduce_sum(tf.math.square(actions), 1)), 0)
+                # + ACTION_L2_REG_FACTOR * action_mean_l2
+            actor_grad = tape.gradient(actor_loss, actor_model.trainable_variables)
+            actor_optimizer.apply_gradients(
+                zip(actor_grad, actor_model.trainable_variables)
+            )
 
-        mlflow.log_metric('batch_actor_loss', actor_loss.numpy())
-        mlflow.log_metric('batch_critic_loss', critic_loss.numpy())
-        actor_grad = tape.gradient(actor_loss, actor_model.trainable_variables)
-        actor_optimizer.apply_gradients(
-            zip(actor_grad, actor_model.trainable_variables)
-        )
+        with self.timer.phase('learn_logging'):
+            mlflow.log_metric('batch_actor_loss', actor_loss.numpy())
+            mlflow.log_metric('batch_critic_loss', critic_loss.numpy())
 
         return actor_loss, critic_loss
@@ -0,0 +1,138 @@
+"""
+CPU budget of the training processes: each process role gets a thread count and a CPU affinity set, so that
+TensorFlow, Bullet and the BLAS libraries of several processes don't oversubscribe the machine.
+must be applied before tensorflow and numpy are imported, their thread pools are sized on import
+"""
+import contextlib
+import json
+import logging
+import os
+import sys
+
+ROLES = ('learner', 'rollout_worker', 'evaluator', 'viewer')
+# roles that run on a single dedicated CPU each, the learners share the remaining CPUs
+SINGLE_CPU_ROLES = ('evaluator', 'rollout_worker', 'viewer')
+# processes of each role in a training run
+DEFAULT_ROLE_COUNTS = {'learner': 1, 'evaluator': 2}
+# the planned layout, inherited by the child processes
+LAYOUT_ENVIRONMENT_VARIABLE = 'WALKER_CPU_LAYOUT'
+THREAD_ENVIRONMENT_VARIABLES = ('OMP_NUM_THREADS', 'OPENBLAS_NUM_THREADS', 'MKL_NUM_THREADS',
+                                'NUMEXPR_NUM_THREADS', 'VECLIB_MAXIMUM_THREADS', 'TF_NUM_INTRAOP_THREADS')
+
+
+def get_available_cpus():
+    if hasattr(os, 'sched_getaffinity'):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def plan_layout(role_counts, cpus=None):
+    """
+    returns {role: [CPU list of each process of the role]}.
+    single CPU roles take CPUs from the end of the list, the learners split the rest. when there are not
+    enough CPUs the learners share the rest, and the single CPU processes share the list
+    """
+    cpus = get_available_cpus() if cpus is None else list(cpus)
+    layout = {}
+    single_cpu_processes = 0
+    for role in SINGLE_CPU_ROLES:
+        layout[role] = []
+        for i in range(role_counts.get(role, 0)):
+            layout[role].append([cpus[len(cpus) - 1 - single_cpu_processes % len(cpus)]])
+            single_cpu_processes += 1
+    learners = role_counts.get('learner', 0)
+    learner_cpus = cpus[:max(0, len(cpus) - single_cpu_processes)]
+    if len(learner_cpus) < learners:
+        logging.warning('{} CPUs are not enough for {} learners and {} single CPU processes, the learners share '
+                        'CPUs'.format(len(cpus), learners, single_cpu_processes))
+        # the single CPU processes keep their CPUs, unless they took all of them
+        learner_cpus = learner_cpus or cpus
+    chunk_size, remainder = divmod(len(learner_cpus), learners) if learners else (0, 0)
+    layout['learner'] = []
+    start = 0
+    for i in range(learners):
+        end = start + chunk_size + (1 if i < remainder else 0)
+        layout['learner'].append(learner_cpus[start:end] or [learner_cpus[i % len(learner_cpus)]])
+        start = end
+    return layout
+
+
+def get_thread_settings(threads):
+    settings = {variable: str(threads) for variable in THREAD_ENVIRONMENT_VARIABLES}
+    settings['TF_NUM_INTEROP_THREADS'] = str(max(1, threads // 4))
+    return settings
+
+
+@contextlib.contextmanager
+def role_environment(threads):
+    """
+    temporarily sets the thread environment variables, for starting child processes of another role
+    """
+    settings = get_thread_settings(threads)
+    previous = {variable: os.environ.get(variable) for variable in settings}
+    os.environ.update(settings)
+    try:
+        yield
+    finally:
+        for variable, value in previous.items():
+            if value is None:
+                os.environ.pop(variable, None)
+            else:
+                os.environ[variable] = value
+
+
+def apply_role(role, cpus, threads=None):
+    """
+    applies the thread count and the CPU affinity of the current process
+    """
+    threads = len(cpus) if threads is None else threads
+    os.environ.update(get_thread_settings(threads))
+    if hasattr(os, 'sched_setaffinity'):
+        os.sched_setaffinity(0, cpus)
+    tf = sys.modules.get('tensorflow')
+    if tf is not None:
+        # only possible before tensorflow runs its first operation
+        try:
+            tf.config.threading.set_intra_op_parallelism_threads(threads)
+            tf.config.threading.set_inter_op_parallelism_threads(max(1, threads // 4))
+        except RuntimeError:
+            logging.warning('TensorFlow is already initialized, its thread pools of the {} are not changed'.format(
+                role))
+    logging.info('Process {} runs as {} on CPUs {} with {} threads'.format(os.getpid(), role, cpus, threads))
+
+
+def set_layout(layout):
+    os.environ[LAYOUT_ENVIRONMENT_VARIABLE] = json.dumps(layout)
+
+
+def get_layout():
+    value = os.environ.get(LAYOUT_ENVIRONMENT_VARIABLE)
+    return json.loads(value) if value else None
+
+
+def get_role_cpus(role):
+    """
+    the CPU list of each process of the role in the inherited layout, None without a layout
+    """
+    layout = get_layout()
+    if not layout or not layout.get(role):
+        return None
+    return layout[role]
+
+
+def log_layout(layout):
+    for role in ROLES:
+        for index, cpus in enumerate(layout.get(role, [])):
+            logging.info('CPU layout: {} {} on CPUs {}'.format(role, index, cpus))
+
+
+def configure_process(role, role_counts=None):
+    """
+    plans the layout of a process tree from its root process, applies the root's role and keeps the layout
+    for the child processes
+    """
+    layout = plan_layout(role_counts or {role: 1})
+    log_layout(layout)
+    set_layout(layout)
+    apply_role(role, layout[role][0])
+    return layout
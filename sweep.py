@@ -0,0 +1,230 @@
+"""
+hyperparameter sweep over the DDPG and Environment class constants.
+each trial runs in its own process and its own mlflow run, trials that fall behind the others are stopped early.
+
+the search space is a JSON file mapping "<Class>.<CONSTANT>" to a list of values, or for random search also
+to a range {"min": ..., "max": ..., "log": false, "integer": false}, e.g.
+    {"DDPG.GAMMA": [0.95, 0.99], "DDPG.TAU": {"min": 0.001, "max": 0.1, "log": true}}
+"""
+import argparse
+import itertools
+import json
+import logging
+import math
+import multiprocessing
+import os
+import queue
+import random
+import time
+import uuid
+
+import resources
+
+SWEEPABLE_CLASSES = ('DDPG', 'Environment')
+# seconds between checks of the running trials while waiting for their reports
+QUEUE_POLL_TIMEOUT = 1
+
+
+def grid_search(space):
+    for name, values in space.items():
+        if not isinstance(values, list):
+            raise ValueError('grid search needs a list of values for {}'.format(name))
+    names = list(space)
+    return [dict(zip(names, values)) for values in itertools.product(*(space[name] for name in names))]
+
+
+def sample_value(values, rng):
+    if isinstance(values, list):
+        return rng.choice(values)
+    low, high = values['min'], values['max']
+    if values.get('log', False):
+        value = math.exp(rng.uniform(math.log(low), math.log(high)))
+    else:
+        value = rng.uniform(low, high)
+    return int(round(value)) if values.get('integer', False) else value
+
+
+def random_search(space, trials, seed=None):
+    rng = random.Random(seed)
+    return [{name: sample_value(values, rng) for name, values in space.items()} for i in range(trials)]
+
+
+def apply_params(params, classes):
+    for name, value in params.items():
+        class_name, constant = name.split('.', 1)
+        if class_name not in classes or not hasattr(classes[class_name], constant):
+            raise ValueError('{} is not a constant of {}'.format(name, ', '.join(SWEEPABLE_CLASSES)))
+        setattr(classes[class_name], constant, value)
+
+
+def run_trial(trial_index, params, sweep_id, max_episodes, evaluation_workers, layout, reports, stop_event):
+    """
+    entry point of a trial process, the class constants are changed only within this process
+    """
+    resources.set_layout(layout)
+    resources.apply_role('learner', layout['learner'][0])
+    # the learner is imported only by the trial processes, the sweep process itself stays light
+    import mlflow
+    import ddpg
+    from Environment import Environment
+
+    ddpg.configure()
+    ddpg.DDPG.EVALUATION_WORKERS = evaluation_workers
+    apply_params(params, {'DDPG': ddpg.DDPG, 'Environment': Environment})
+    ddpg.DDPG.MAX_EPISODES = max_episodes
+    ddpg.DDPG.KEYBOARD_CONTROL = False
+
+    class SweepTrial(ddpg.DDPG):
+        # read by run_multiple_episodes before every episode, so an early stop does not wait for an evaluation
+        @property
+        def stop_requested(self):
+            return self._stop_requested or stop_event.is_set()
+
+        @stop_requested.setter
+        def stop_requested(self, value):
+            self._stop_requested = value
+
+        def on_evaluation_result(self, episode_index, average_reward_test, models_weights):
+            super().on_evaluation_result(episode_index, average_reward_test, models_weights)
+            reports.put((trial_index, average_reward_test))
+
+    with mlflow.start_run(run_name='{}_trial_{}'.format(sweep_id, trial_index)):
+        mlflow.set_tag('sweep_id', sweep_id)
+        mlflow.set_tag('trial_index', trial_index)
+        trial = SweepTrial()
+        trial.checkpoint_dir = os.path.join(trial.checkpoint_dir, sweep_id, 'trial_{}'.format(trial_index))
+        trial.run_multiple_episodes()
+        mlflow.set_tag('early_stopped', trial.stop_requested)
+
+
+class MedianStoppingRule:
+    """
+    stops a trial whose best test reward so far is below the median of the other trials' best test rewards
+    after the same number of evaluations, or after all their evaluations so far for the trials that are behind
+    """
+
+    def __init__(self, min_evaluations, min_trials=3):
+        self.min_evaluations = min_evaluations
+        self.min_trials = min_trials
+        self.best_rewards = {}
+
+    def report(self, trial_index, reward):
+        """
+        records a test reward and returns True if the trial should stop
+        """
+        history = self.best_rewards.setdefault(trial_index, [])
+        history.append(max(reward, history[-1]) if history else reward)
+        evaluation_index = len(history) - 1
+        if evaluation_index + 1 < self.min_evaluations:
+            return False
+        # the first trial to reach an evaluation count is compared too, against the others' latest best
+        others = [best[min(len(best) - 1, evaluation_index)] for other_index, best in self.best_rewards.items()
+                  if other_index != trial_index]
+        if len(others) + 1 < self.min_trials:
+            return False
+        others.sort()
+        median = (others[(len(others) - 1) // 2] + others[len(others) // 2]) / 2
+        return history[-1] < median
+
+
+def get_default_processes(evaluation_workers):
+    # each trial also runs its own evaluation workers
+    return max(1, len(resources.get_available_cpus()) // (1 + evaluation_workers))
+
+
+def record_report(report, results, running, stopping_rule):
+    trial_index, reward = report
+    results[trial_index]['rewards'].append(reward)
+    if stopping_rule.report(trial_index, reward) and trial_index in running:
+        logging.info('Trial {} stopped early, test reward {:0.1f}'.format(trial_index, reward))
+        results[trial_index]['early_stopped'] = True
+        running[trial_index][1].set()
+
+
+def drain_reports(reports, results, running, stopping_rule):
+    while True:
+        try:
+            report = reports.get_nowait()
+        except queue.Empty:
+            return
+        record_report(report, results, running, stopping_rule)
+
+
+def run_sweep(trials, processes, max_episodes, evaluation_workers, min_evaluations, sweep_id):
+    context = multiprocessing.get_context('spawn')
+    layout = resources.plan_layout({'learner': processes, 'evaluator': processes * evaluation_workers})
+    resources.log_layout(layout)
+    # each slot runs one trial at a time, on its own learner and evaluator CPUs
+    free_slots = list(range(processes))
+    reports = context.Queue()
+    stopping_rule = MedianStoppingRule(min_evaluations)
+    pending = list(enumerate(trials))
+    running = {}
+    results = {}
+    logging.info('Sweep {}: {} trials on {} processes'.format(sweep_id, len(trials), processes))
+    while pending or running:
+        while pending and len(running) < processes:
+            trial_index, params = pending.pop(0)
+            slot = free_slots.pop(0)
+            trial_layout = {'learner': [layout['learner'][slot]],
+                            'evaluator': layout['evaluator'][slot * evaluation_workers:
+                                                             (slot + 1) * evaluation_workers]}
+            stop_event = context.Event()
+            # not a pool, trials are regular processes so they can start their own evaluation workers
+            process = context.Process(target=run_trial, name='trial_{}'.format(trial_index),
+                                      args=(trial_index, params, sweep_id, max_episodes, evaluation_workers,
+                                            trial_layout, reports, stop_event))
+            process.start()
+            running[trial_index] = (process, stop_event, slot)
+            results[trial_index] = {'params': params, 'rewards': [], 'early_stopped': False}
+            logging.info('Trial {} started: {}'.format(trial_index, params))
+        try:
+            record_report(reports.get(timeout=QUEUE_POLL_TIMEOUT), results, running, stopping_rule)
+            drain_reports(reports, results, running, stopping_rule)
+        except queue.Empty:
+            pass
+        for trial_index, (process, stop_event, slot) in list(running.items()):
+            if not process.is_alive():
+                process.join()
+                free_slots.append(slot)
+                results[trial_index]['exit_code'] = process.exitcode
+                del running[trial_index]
+                logging.info('Trial {} finished with exit code {}'.format(trial_index, process.exitcode))
+    # the reports a trial queued just before it exited
+    drain_reports(reports, results, running, stopping_rule)
+    for result in results.values():
+        result['best_reward'] = max(result['rewards'], default=None)
+    return [results[trial_index] for trial_index in sorted(results)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('space', help='JSON file of the search space')
+    parser.add_argument('--mode', choices=('grid', 'random'), default='grid')
+    parser.add_argument('--trials', type=int, default=10, help='number of trials of a random search')
+    parser.add_argument('--seed', type=int, help='seed of the random search')
+    parser.add_argument('--processes', type=int, help='concurrent trials, sized to the machine by default')
+    parser.add_argument('--max-episodes', type=int, default=1000, help='episodes of each trial')
+    parser.add_argument('--evaluation-workers', type=int, default=2, help='evaluation processes of each trial')
+    parser.add_argument('--min-evaluations', type=int, default=5,
+                        help='test evaluations of a trial before it may be stopped early')
+    parser.add_argument('--output', help='JSON file of the trials results')
+    args = parser.parse_args()
+    logging.basicConfig(format='%(asctime)-15s [%(levelname)s]: %(message)s', level=logging.INFO)
+
+    with open(args.space) as space_file:
+        space = json.load(space_file)
+    trials = grid_search(space) if args.mode == 'grid' else random_search(space, args.trials, args.seed)
+    sweep_id = 'sweep_{}_{}'.format(time.strftime('%Y%m%d_%H%M%S'), uuid.uuid4().hex[:6])
+    results = run_sweep(trials, args.processes or get_default_processes(args.evaluation_workers),
+                        args.max_episodes, args.evaluation_workers, args.min_evaluations, sweep_id)
+    for result in sorted(results, key=lambda x: -float('inf') if x['best_reward'] is None else x['best_reward'],
+                         reverse=True):
+        logging.info('best reward {}: {}'.format(result['best_reward'], result['params']))
+    if args.output:
+        with open(args.output, 'w') as output_file:
+            json.dump({'sweep_id': sweep_id, 'trials': results}, output_file, indent=2)
+
+
+if __name__ == '__main__':
+    main()
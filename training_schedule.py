@@ -0,0 +1,66 @@
+class TrainingSchedule:
+    """
+    update-to-data schedule of the learner: no updates during the warm-up steps, then updates_per_cycle
+    gradient updates every env_steps_per_cycle environment steps, and a target update every
+    target_update_interval gradient updates.
+
+    in adaptive mode updates_per_cycle is recomputed from the measured environment step and gradient update times,
+    so that learn_time_fraction of the time is spent on gradient updates
+    """
+    # smoothing factor of the measured times moving averages
+    TIME_SMOOTHING = 0.05
+
+    def __init__(self, warmup_steps=0, updates_per_cycle=1, env_steps_per_cycle=1, target_update_interval=1,
+                 adaptive=False, learn_time_fraction=0.5, min_updates_per_cycle=0.1, max_updates_per_cycle=8):
+        if not 0 <= learn_time_fraction < 1:
+            raise ValueError('learn_time_fraction must be in [0, 1), got {}'.format(learn_time_fraction))
+        self.warmup_steps = warmup_steps
+        self.updates_per_cycle = updates_per_cycle
+        self.env_steps_per_cycle = env_steps_per_cycle
+        self.target_update_interval = target_update_interval
+        self.adaptive = adaptive
+        self.learn_time_fraction = learn_time_fraction
+        self.min_updates_per_cycle = min_updates_per_cycle
+        self.max_updates_per_cycle = max_updates_per_cycle
+        self.env_steps = 0
+        self.updates = 0
+        # fractional updates carried to the next cycles, allows less than one update per cycle
+        self.update_credit = 0
+        self.env_step_time = None
+        self.update_time = None
+
+    def get_updates(self):
+        """
+        counts an environment step and returns the number of gradient updates to do after it
+        """
+        self.env_steps += 1
+        if self.env_steps <= self.warmup_steps or self.env_steps % self.env_steps_per_cycle != 0:
+            return 0
+        self.update_credit += self.updates_per_cycle
+        updates = int(self.update_credit)
+        self.update_credit -= updates
+        return updates
+
+    def update_done(self):
+        """
+        counts a gradient update and returns True if the target models should be updated after it
+        """
+        self.updates += 1
+        return self.updates % self.target_update_interval == 0
+
+    def record_times(self, env_step_time, updates_time=0, updates=0):
+        """
+        env_step_time - seconds of one environment step, updates_time - seconds of its following gradient updates
+        """
+        self.env_step_time = self._smooth(self.env_step_time, env_step_time)
+        if updates:
+            self.update_time = self._smooth(self.update_time, updates_time / updates)
+        if self.adaptive and self.update_time:
+            # solve updates * update_time / (updates * update_time + steps * env_step_time) = learn_time_fraction
+            updates_per_cycle = self.learn_time_fraction / (1 - self.learn_time_fraction) * \
+                self.env_steps_per_cycle * self.env_step_time / self.update_time
+            self.updates_per_cycle = min(self.max_updates_per_cycle, max(self.min_updates_per_cycle,
+                                                                         updates_per_cycle))
+
+    def _smooth(self, average, value):
+        return value if average is None else average + self.TIME_SMOOTHING * (value - average)
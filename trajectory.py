@@ -0,0 +1,94 @@
+"""
+compact binary trajectory files: a header with the bone sizes, followed by fixed size float32 frames of
+the bones positions, orientations (HPR) and the action of each environment step
+"""
+import logging
+import os
+import struct
+
+import numpy as np
+
+MAGIC = b'WLKT'
+VERSION = 1
+HEADER_FORMAT = '<4sIII'
+# frames buffered in memory between writes
+FLUSH_FRAMES = 64
+
+
+def get_frame_dtype(bones_count, action_size):
+    return np.dtype([('episode', '<u4'), ('step', '<u4'),
+                     ('positions', '<f4', (bones_count, 3)), ('orientations', '<f4', (bones_count, 3)),
+                     ('action', '<f4', (action_size,))])
+
+
+class TrajectoryRecorder:
+    def __init__(self, path, bone_sizes, action_size, flush_frames=FLUSH_FRAMES):
+        """
+        bone_sizes - n x 3 array of each bone (length, height, width)
+        """
+        bone_sizes = np.asarray(bone_sizes, dtype='<f4')
+        self.frames = np.zeros(flush_frames, dtype=get_frame_dtype(len(bone_sizes), action_size))
+        self.frames_count = 0
+        self.episode = 0
+        self.step = 0
+        self.file = open(path, 'wb')
+        self.file.write(struct.pack(HEADER_FORMAT, MAGIC, VERSION, len(bone_sizes), action_size))
+        self.file.write(bone_sizes.tobytes())
+        logging.info('Recording trajectories to {}'.format(path))
+
+    def new_episode(self):
+        if self.step > 0:
+            self.episode += 1
+        self.step = 0
+
+    def record(self, positions, orientations, action):
+        frame = self.frames[self.frames_count]
+        frame['episode'] = self.episode
+        frame['step'] = self.step
+        frame['positions'] = positions
+        frame['orientations'] = orientations
+        frame['action'] = action
+        self.step += 1
+        self.frames_count += 1
+        if self.frames_count == len(self.frames):
+            self.flush()
+
+    def flush(self):
+        self.file.write(self.frames[:self.frames_count].tobytes())
+        self.file.flush()
+        self.frames_count = 0
+
+    def close(self):
+        self.flush()
+        self.file.close()
+
+
+class TrajectoryReader:
+    """
+    reads the frames of a trajectory file, including frames appended while it is being recorded
+    """
+
+    def __init__(self, path):
+        self.file = open(path, 'rb')
+        header = self.file.read(struct.calcsize(HEADER_FORMAT))
+        magic, version, bones_count, action_size = struct.unpack(HEADER_FORMAT, header)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError('{} is not a version {} trajectory file'.format(path, VERSION))
+        self.bone_sizes = np.frombuffer(self.file.read(bones_count * 3 * 4), dtype='<f4').reshape(bones_count, 3)
+        self.frame_dtype = get_frame_dtype(bones_count, action_size)
+        self.frames_offset = self.file.tell()
+
+    def read_new_frames(self):
+        # a partially written frame is left for the next read
+        available = os.fstat(self.file.fileno()).st_size - self.file.tell()
+        frames_count = available // self.frame_dtype.itemsize
+        if frames_count == 0:
+            return np.zeros(0, dtype=self.frame_dtype)
+        return np.frombuffer(self.file.read(frames_count * self.frame_dtype.itemsize), dtype=self.frame_dtype)
+
+    def read_all_frames(self):
+        self.file.seek(self.frames_offset)
+        return self.read_new_frames()
+
+    def close(self):
+        self.file.close()
@@ -0,0 +1,141 @@
+"""
+replays trajectory files recorded by Panda3dPhysics.start_recording, in its own process so the trainer is never
+blocked by the rendering. can follow a file while it is being recorded, or render offscreen into an image sequence
+and a GIF
+"""
+import argparse
+import glob
+import logging
+import os
+
+import numpy as np
+
+from direct.showbase.ShowBase import ShowBase
+from direct.task import Task
+import panda3d.core
+
+from trajectory import TrajectoryReader
+
+CAMERA_OFFSET = panda3d.core.Vec3(30, 30, 30)
+# in follow mode, frames older than this many seconds of playback are dropped to catch up with the trainer
+MAX_FOLLOW_LAG = 2
+
+
+class TrajectoryViewer(ShowBase):
+    def __init__(self, path, fps=30, follow=False, output_dir=None):
+        ShowBase.__init__(self, windowType='offscreen' if output_dir else None)
+        self.reader = TrajectoryReader(path)
+        self.fps = fps
+        self.follow = follow
+        self.output_dir = output_dir
+        self.frames = self.reader.read_all_frames()
+        self.frame_index = 0
+        # numbers the written frames, the frame index is reset when following trims the frames
+        self.output_index = 0
+        self.last_frame_time = 0
+        self.bone_nps = [self.visualize_bone(*bone_size) for bone_size in self.reader.bone_sizes]
+        self.visualize_ground()
+        self.create_light()
+        render.setAntialias(panda3d.core.AntialiasAttrib.MAuto)
+        render.setShaderAuto()
+        taskMgr.add(self.play, 'play')
+        logging.info('Replaying {} frames from {}'.format(len(self.frames), path))
+
+    def create_light(self):
+        ambient_light_np = render.attachNewNode(panda3d.core.AmbientLight('ambientLight'))
+        ambient_light_np.node().setColor(panda3d.core.Vec4(0.5, 0.5, 0.5, 1))
+        render.setLight(ambient_light_np)
+        self.tracker_light_np = render.attachNewNode(panda3d.core.Spotlight('tracker'))
+        self.tracker_light_np.node().setShadowCaster(True, 2048, 2048)
+        self.tracker_light_np.node().getLens().setFov(170)
+        render.setLight(self.tracker_light_np)
+
+    def visualize_ground(self):
+        card_maker = panda3d.core.CardMaker('')
+        card_maker.setFrame(-100, 300, -100, 100)
+        ground_np = render.attachNewNode(card_maker.generate())
+        ground_np.lookAt(0, 0, -10)
+        ground_np.setTexture(loader.loadTexture('maps/grid.rgb'))
+
+    def visualize_bone(self, length, height, width):
+        bone_np = render.attachNewNode('bone')
+        bone_np.setShaderAuto()
+        model = loader.loadModel('models/box.egg')
+        model.setScale(panda3d.core.Vec3(length, height, width) * 2)
+        model.setPos(panda3d.core.Vec3(-length, -height, -width))
+        model.reparentTo(bone_np)
+        bone_np.setColor(0.6, 0.6, 1.0, 1.0)
+        return bone_np
+
+    def show_frame(self, frame):
+        for bone_np, position, orientation in zip(self.bone_nps, frame['positions'], frame['orientations']):
+            bone_np.setPosHpr(*position, *orientation)
+        walker_position = panda3d.core.Vec3(*np.mean(frame['positions'], axis=0))
+        self.camera.setPos(walker_position + CAMERA_OFFSET)
+        self.camera.lookAt(walker_position)
+        self.tracker_light_np.setPos(walker_position + panda3d.core.Vec3(0, 0, 100))
+        self.tracker_light_np.lookAt(walker_position)
+
+    def play(self, task):
+        if self.follow:
+            new_frames = self.reader.read_new_frames()
+            if len(new_frames):
+                self.frames = np.concatenate((self.frames[self.frame_index:], new_frames))
+                self.frame_index = max(0, len(self.frames) - MAX_FOLLOW_LAG * self.fps)
+        if self.frame_index >= len(self.frames):
+            if not self.follow:
+                return self.finish()
+            return Task.cont
+        if self.output_dir is None and task.time - self.last_frame_time < 1 / self.fps:
+            return Task.cont
+        self.last_frame_time = task.time
+        self.show_frame(self.frames[self.frame_index])
+        if self.output_dir is not None:
+            self.graphicsEngine.renderFrame()
+            self.win.saveScreenshot(panda3d.core.Filename(
+                os.path.join(self.output_dir, 'frame_{:06d}.png'.format(self.output_index))))
+            self.output_index += 1
+        self.frame_index += 1
+        return Task.cont
+
+    def finish(self):
+        self.reader.close()
+        self.userExit()
+        return Task.done
+
+
+def write_gif(output_dir, gif_path, fps):
+    try:
+        import imageio
+    except ImportError:
+        raise ImportError('writing a GIF requires imageio, install it with "pip install imageio"')
+    frame_paths = sorted(glob.glob(os.path.join(output_dir, 'frame_*.png')))
+    imageio.mimsave(gif_path, [imageio.imread(frame_path) for frame_path in frame_paths], duration=1 / fps)
+    logging.info('GIF of {} frames written to {}'.format(len(frame_paths), gif_path))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('path', help='trajectory file')
+    parser.add_argument('--fps', type=int, default=30)
+    parser.add_argument('--follow', action='store_true', help='keep playing frames appended by the trainer')
+    parser.add_argument('--output-dir', help='render offscreen into png frames in this directory')
+    parser.add_argument('--gif', help='combine the rendered frames into this GIF, requires --output-dir')
+    args = parser.parse_args()
+    logging.basicConfig(format='%(asctime)-15s [%(levelname)s]: %(message)s', level=logging.INFO)
+    if args.gif and not args.output_dir:
+        parser.error('--gif requires --output-dir')
+    if args.output_dir:
+        os.makedirs(args.output_dir, exist_ok=True)
+
+    viewer = TrajectoryViewer(args.path, args.fps, args.follow, args.output_dir)
+    try:
+        viewer.run()
+    except SystemExit:
+        pass
+    if args.gif:
+        write_gif(args.output_dir, args.gif, args.fps)
+
+
+if __name__ == '__main__':
+    main()